@@ -6,6 +6,7 @@ Created on Wed Jan  1 19:28:32 2025
 """
 
 from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtCore import QThread
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 import matplotlib.pyplot as plt
 import numpy as np
@@ -15,6 +16,10 @@ import matplotlib
 import datetime
 import os
 
+from frame_display import LatestFrameSlot, DisplayScheduler
+from series_script import compile_series, SeriesError
+from capture_runner import run_plan, OUTPUT_DIR
+
 # Eliminate Extra Figure
 matplotlib.use('Qt5Agg')
 plt.ioff() 
@@ -25,30 +30,16 @@ from PIXIS_PICAM_Initialization import *
 
 
 class CaptureSeriesThread(QThread):
-    update_image = pyqtSignal(np.ndarray)
-
-    def __init__(self, series, parent=None):
+    def __init__(self, plan, camera, frame_slot, parent=None):
         super().__init__(parent)
-        self.series = series
+        self.plan = plan
+        self.camera = camera
+        self.frame_slot = frame_slot
 
     def run(self):
-        for command in self.series:
-            if len(command) == 1:
-                time.sleep(command[0])
-            else:
-                num_exposures, exposure_time, target_name = command
-                for exposure in range(num_exposures):
-                    cam1.set_attribute_value('Exposure Time', int(exposure_time))
-                    image = cam1.grab(1)
-                    self.update_image.emit(image)
-                    
-                    # File Saving
-                    target = target_name.strip().replace(" ", "_")
-                    current_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                    filename = f"{target}_{current_time}"    
-                    file_path = os.path.join("C:\\Users\\Owner\\PICAM\\images", filename)
-                    image.tofile(file_path + '.bin')
-                    
+        run_plan(self.plan, self.camera, emit=lambda event, **fields: None,
+                 output_dir=OUTPUT_DIR, on_frame=self.frame_slot.put)
+
 
 class Ui_Form(object):
     def setupUi(self, Form):
@@ -130,6 +121,14 @@ class Ui_Form(object):
         self.Cap2.setStyleSheet("font-size: 14px;")
         self.Cap2.clicked.connect(self.ExecuteSeries)
         
+        # Series Estimate / Error Label
+        self.SeriesS = QtWidgets.QLabel(Form)
+        self.SeriesS.setGeometry(QtCore.QRect(35, 880, 300, 80))
+        self.SeriesS.setObjectName("SeriesS")
+        self.SeriesS.setWordWrap(True)
+        self.SeriesS.setAlignment(QtCore.Qt.AlignTop)
+        self.SeriesS.setStyleSheet("font-size: 12px;")
+        
         # Exposure Spinbox
         self.Exposure = QtWidgets.QSpinBox(Form)
         self.Exposure.setGeometry(QtCore.QRect(355, 190, 60, 30))
@@ -216,10 +215,17 @@ class Ui_Form(object):
         self.CG.setObjectName("CG")
         self.updateCameraStatus()
         
+        # Display Rate Status
+        self.DispS = QtWidgets.QLabel(Form)
+        self.DispS.setGeometry(QtCore.QRect(840, 40, 300, 20))
+        self.DispS.setObjectName("DispS")
+        self.DispS.setStyleSheet("font-size: 14px;")
+        
         # Timer for live Updates
         self.timer = QtCore.QTimer(Form)
         self.timer.timeout.connect(self.updateCameraStatus)
         self.timer.timeout.connect(self.TempStatus)
+        self.timer.timeout.connect(self.DisplayStatus)
         self.timer.start(500)
         
         # Graph
@@ -239,6 +245,11 @@ class Ui_Form(object):
         self.graphLayout.addWidget(self.canvas)        
         self.figure.set_facecolor('#F0F0F0')  # Match PyQt GUI background
         
+        # Series frames land in a single slot; the GUI repaints the newest one at a capped rate
+        self.frame_slot = LatestFrameSlot()
+        self.display_scheduler = DisplayScheduler(self.frame_slot, self.display_image, max_fps=10, parent=Form)
+        self.display_scheduler.start()
+        
         # Plot appearance
         self.ax.set_xlabel("X-axis")
         self.ax.set_ylabel("Y-axis")
@@ -261,11 +272,16 @@ class Ui_Form(object):
         self.stop = True
         self.cam_open = False
         self.Form.close()
+        camera_manager.close()
         
     def updateCameraStatus(self):
+        # Status polls skip their update while a capture thread holds the camera
+        temperature = camera_manager.poll('get_attribute_value', 'Sensor Temperature Reading')
+        if temperature is None:
+            return
         self.CG.clear()
         if self.stop == False:
-            if -72 < cam1.get_attribute_value('Sensor Temperature Reading') < -68:
+            if -72 < temperature < -68:
                 self.CG.setText("Camera is ready for Image Capture")
                 self.CG.setStyleSheet("color: green; font-size: 14px;")
             else:
@@ -273,8 +289,14 @@ class Ui_Form(object):
                 self.CG.setStyleSheet("color: red; font-size: 14px;")
 
     
+    def DisplayStatus(self):
+        self.DispS.setText(f"Display: {self.display_scheduler.display_fps:.1f} fps, "
+                           f"{self.frame_slot.frames_skipped} frames skipped")
+    
     def TempStatus(self):
-        self.TmpS.setText(str(cam1.get_attribute_value('Sensor Temperature Reading')))
+        temperature = camera_manager.poll('get_attribute_value', 'Sensor Temperature Reading')
+        if temperature is not None:
+            self.TmpS.setText(str(temperature))
         
     def setFunction(self):
         self.TGS.setText(str(self.Target.text()))
@@ -299,22 +321,23 @@ class Ui_Form(object):
                 continue
     
             if not self.stop:
-                exposure_time = int(self.ExpS.value()) 
+                # Reuse the shared camera handle instead of reopening the device every loop
+                exposure_time = int(self.ExpS.text())
                 cam1.set_attribute_value('Exposure Time', exposure_time)
-                with PrincetonInstruments.PicamCamera('0809080002') as cam1:
-                    cam1.start_acquisition()
-                    while True:
-                        cam1.wait_for_frame()  
-                        image = cam1.read_oldest_image()
-                        self.image_handle.set_data(image)
-                        self.canvas.draw_idle()
-                        
-                        # File Saving
-                        target = self.Target.text().strip().replace(" ", "_")
-                        current_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-                        filename = f"{target}_{current_time}"    
-                        file_path = os.path.join("C:\\Users\\Owner\\PICAM\\images", filename)
-                        image.tofile(file_path + '.bin')
+                cam1.start_acquisition()
+                while self.cam_open and not self.paused:
+                    cam1.wait_for_frame()  
+                    image = cam1.read_oldest_image()
+                    self.image_handle.set_data(image)
+                    self.canvas.draw_idle()
+                    
+                    # File Saving
+                    target = self.Target.text().strip().replace(" ", "_")
+                    current_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+                    filename = f"{target}_{current_time}"    
+                    file_path = os.path.join(OUTPUT_DIR, filename)
+                    image.tofile(file_path + '.bin')
+                cam1.stop_acquisition()
                 
             else:
                 break
@@ -328,26 +351,19 @@ class Ui_Form(object):
         self.resumeButton.setEnabled(True)
         
     def ExecuteSeries(self):
-        input_string = self.Param.toPlainText()
-        series = []
-    
-        rows = input_string.splitlines()
-        for row in rows:
-            parts = row.split()
-            if not parts:
-                continue
-    
-            if parts[0] == 'add' and parts[1] == 'delay':
-                series.append([float(parts[2])])
-            else:
-                num_exposures = int(parts[0])
-                exposure_time = float(parts[1])
-                file_name = parts[2]
-                series.append([num_exposures, exposure_time, file_name])
+        # Validate the whole script before anything runs
+        try:
+            plan = compile_series(self.Param.toPlainText())
+        except SeriesError as e:
+            self.SeriesS.setStyleSheet("color: red; font-size: 12px;")
+            self.SeriesS.setText(str(e))
+            return
+        self.SeriesS.setStyleSheet("font-size: 12px;")
+        self.SeriesS.setText(plan.summary())
     
         # Create and start the thread
-        self.capture_thread = CaptureSeriesThread(series)
-        self.capture_thread.update_image.connect(self.display_image)
+        self.frame_slot.reset_counters()
+        self.capture_thread = CaptureSeriesThread(plan, cam1, self.frame_slot)
         self.capture_thread.start()
     
     def display_image(self, image):
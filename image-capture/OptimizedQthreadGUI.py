@@ -11,9 +11,12 @@ import matplotlib.pyplot as plt
 import numpy as np
 import threading
 import time
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import QThread
 import matplotlib
 
+from frame_display import LatestFrameSlot, DisplayScheduler
+from series_script import compile_series, SeriesError, Delay, Exposures
+
 # Prevent additional Figure Creation
 matplotlib.use('Qt5Agg')
 plt.ioff() 
@@ -21,23 +24,22 @@ plt.ioff()
 
 
 class CaptureSeriesThread(QThread):
-    update_image = pyqtSignal(np.ndarray)
-
-    def __init__(self, series, parent=None):
+    def __init__(self, plan, frame_slot, parent=None):
         super().__init__(parent)
-        self.series = series
+        self.plan = plan
+        self.frame_slot = frame_slot
 
     def run(self):
-        for command in self.series:
-            if len(command) == 1:
-                time.sleep(command[0])
-            else:
-                num_exposures, exposure_time, file_name = command
-                for exposure in range(num_exposures):
+        for step in self.plan.steps:
+            if isinstance(step, Delay):
+                time.sleep(step.seconds)
+            elif isinstance(step, Exposures):
+                for exposure in range(step.count):
                     image = np.random.rand(50, 50)
-                    self.update_image.emit(image)
-                    sleep_time = exposure_time/1000
+                    self.frame_slot.put(image)
+                    sleep_time = step.exposure_ms/1000
                     time.sleep(sleep_time)
+            # WaitTemperature: the demo sensor is always at its set point
 
 class Ui_Form(object):
     def setupUi(self, Form):
@@ -119,6 +121,14 @@ class Ui_Form(object):
         self.Cap2.setStyleSheet("font-size: 14px;")
         self.Cap2.clicked.connect(self.ExecuteSeries)
         
+        # Series Estimate / Error Label
+        self.SeriesS = QtWidgets.QLabel(Form)
+        self.SeriesS.setGeometry(QtCore.QRect(35, 880, 300, 80))
+        self.SeriesS.setObjectName("SeriesS")
+        self.SeriesS.setWordWrap(True)
+        self.SeriesS.setAlignment(QtCore.Qt.AlignTop)
+        self.SeriesS.setStyleSheet("font-size: 12px;")
+        
         # Exposure Spinbox
         self.Exposure = QtWidgets.QSpinBox(Form)
         self.Exposure.setGeometry(QtCore.QRect(355, 190, 60, 30))
@@ -205,10 +215,17 @@ class Ui_Form(object):
         self.CG.setObjectName("CG")
         self.updateCameraStatus()
         
+        # Display Rate Status
+        self.DispS = QtWidgets.QLabel(Form)
+        self.DispS.setGeometry(QtCore.QRect(840, 40, 300, 20))
+        self.DispS.setObjectName("DispS")
+        self.DispS.setStyleSheet("font-size: 14px;")
+        
         # Timer for live Updates
         self.timer = QtCore.QTimer(Form)
         self.timer.timeout.connect(self.updateCameraStatus)
         self.timer.timeout.connect(self.TempStatus)
+        self.timer.timeout.connect(self.DisplayStatus)
         self.timer.start(500)
         
         # Graph
@@ -228,6 +245,11 @@ class Ui_Form(object):
         self.graphLayout.addWidget(self.canvas)        
         self.figure.set_facecolor('#F0F0F0')  # Match PyQt GUI background
         
+        # Series frames land in a single slot; the GUI repaints the newest one at a capped rate
+        self.frame_slot = LatestFrameSlot()
+        self.display_scheduler = DisplayScheduler(self.frame_slot, self.display_image, max_fps=10, parent=Form)
+        self.display_scheduler.start()
+        
         # Plot appearance
         self.ax.set_xlabel("X-axis")
         self.ax.set_ylabel("Y-axis")
@@ -261,6 +283,10 @@ class Ui_Form(object):
             self.CG.setStyleSheet("color: red; font-size: 14px;")
 
     
+    def DisplayStatus(self):
+        self.DispS.setText(f"Display: {self.display_scheduler.display_fps:.1f} fps, "
+                           f"{self.frame_slot.frames_skipped} frames skipped")
+    
     def TempStatus(self):
         self.TmpS.setText(str(self.Temperature.value()))
         
@@ -301,26 +327,19 @@ class Ui_Form(object):
         self.resumeButton.setEnabled(True)
         
     def ExecuteSeries(self):
-        input_string = self.Param.toPlainText()
-        series = []
-    
-        rows = input_string.splitlines()
-        for row in rows:
-            parts = row.split()
-            if not parts:
-                continue
-    
-            if parts[0] == 'add' and parts[1] == 'delay':
-                series.append([float(parts[2])])
-            else:
-                num_exposures = int(parts[0])
-                exposure_time = float(parts[1])
-                file_name = parts[2]
-                series.append([num_exposures, exposure_time, file_name])
+        # Validate the whole script before anything runs
+        try:
+            plan = compile_series(self.Param.toPlainText())
+        except SeriesError as e:
+            self.SeriesS.setStyleSheet("color: red; font-size: 12px;")
+            self.SeriesS.setText(str(e))
+            return
+        self.SeriesS.setStyleSheet("font-size: 12px;")
+        self.SeriesS.setText(plan.summary(frame_shape=(50, 50), bytes_per_pixel=8, readout_time=0))
     
         # Create and start the thread
-        self.capture_thread = CaptureSeriesThread(series)
-        self.capture_thread.update_image.connect(self.display_image)
+        self.frame_slot.reset_counters()
+        self.capture_thread = CaptureSeriesThread(plan, self.frame_slot)
         self.capture_thread.start()
     
     def display_image(self, image):
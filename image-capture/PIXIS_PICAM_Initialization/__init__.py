@@ -3,19 +3,160 @@
 Created on Tue Oct  8 15:29:38 2024
 
 @author: Owner
+
+Shared PIXIS camera handle.
+
+Importing this package is cheap: pylablib is only imported, and the camera
+only opened, the first time cam1 is used. Every user (GUI timers, capture
+threads, the headless runner, the control server) goes through the same
+CameraManager, which keeps exactly one open handle, serializes calls with a
+lock, reopens the camera if a call fails with a device error, and closes it
+at interpreter exit. Only read-only getters are retried on the reopened
+camera: it has the default settings and is not acquiring, so repeating
+anything else would fail confusingly or run with the wrong settings.
 """
 
-import matplotlib.pyplot as plt
-import numpy as np
-import pylablib as pll
+import atexit
+import threading
 
 #modify based on your path
-pll.par["devices/dlls/picam"] = "C:\\Program Files\\Princeton Instruments\\PICam\\Runtime\\Picam.dll"
+PICAM_DLL = "C:\\Program Files\\Princeton Instruments\\PICam\\Runtime\\Picam.dll"
+CAMERA_SERIAL = '0809080002'
+DEFAULT_EXPOSURE = 10
+# Method name prefixes of calls that only read state, and so can be repeated after a reconnect
+RETRY_PREFIXES = ('get_', 'is_')
+
+__all__ = ['CameraManager', 'CameraProxy', 'camera_manager', 'cam1', 'list_cameras',
+           'PICAM_DLL', 'CAMERA_SERIAL', 'DEFAULT_EXPOSURE', 'RETRY_PREFIXES']
+
+
+def _princeton_instruments(dll=PICAM_DLL):
+    import pylablib as pll
+    pll.par["devices/dlls/picam"] = dll
+    from pylablib.devices import PrincetonInstruments
+    return PrincetonInstruments
+
+
+def list_cameras(dll=PICAM_DLL):
+    return _princeton_instruments(dll).list_cameras()
+
+
+class CameraManager:
+    """
+    Lazily opened, thread-safe, single camera handle.
+
+    Parameters:
+    - serial (str): PIXIS serial number.
+    - dll (str): Path to Picam.dll.
+    - simulate (bool): Use the SimulatedCamera instead of the hardware.
+    - exposure (int): Exposure time (ms) set when the camera is opened.
+    """
+
+    def __init__(self, serial=CAMERA_SERIAL, dll=PICAM_DLL, simulate=False, exposure=DEFAULT_EXPOSURE):
+        self.serial = serial
+        self.dll = dll
+        self.simulate = simulate
+        self.exposure = exposure
+        self.lock = threading.RLock()
+        self._camera = None
+        self._device_errors = (OSError,)
+        self._timeout_errors = ()
+        atexit.register(self.close)
+
+    def _open(self):
+        if self.simulate:
+            from .simulated import SimulatedCamera
+            camera = SimulatedCamera()
+        else:
+            PrincetonInstruments = _princeton_instruments(self.dll)
+            self._device_errors = (OSError, PrincetonInstruments.PicamError)
+            self._timeout_errors = (PrincetonInstruments.PicamTimeoutError,)
+            camera = PrincetonInstruments.PicamCamera(self.serial)
+        camera.set_attribute_value('Exposure Time', self.exposure)
+        return camera
+
+    @property
+    def is_open(self):
+        return self._camera is not None
+
+    def get(self):
+        """Return the open camera, opening it on first use. Hold self.lock while using it."""
+        with self.lock:
+            if self._camera is None:
+                self._camera = self._open()
+            return self._camera
+
+    def call(self, method, *args, **kwargs):
+        """
+        Call a camera method under the lock. On a device error the camera is reset, so the next call reopens
+        it; getters (RETRY_PREFIXES) are then retried once, anything else re-raises so the caller can fail.
+        """
+        with self.lock:
+            try:
+                return getattr(self.get(), method)(*args, **kwargs)
+            except self._timeout_errors:
+                raise
+            except self._device_errors:
+                self._reset()
+                if not method.startswith(RETRY_PREFIXES):
+                    raise
+                return getattr(self.get(), method)(*args, **kwargs)
+
+    def poll(self, method, *args, timeout=0.1, default=None):
+        """Like call(), but give up and return default if another thread holds the camera."""
+        if not self.lock.acquire(timeout=timeout):
+            return default
+        try:
+            return self.call(method, *args)
+        finally:
+            self.lock.release()
+
+    def _reset(self):
+        camera, self._camera = self._camera, None
+        if camera is not None:
+            try:
+                camera.close()
+            except Exception:
+                pass
+
+    def close(self):
+        with self.lock:
+            self._reset()
+
+
+class CameraProxy:
+    """
+    Stand-in for a PicamCamera whose methods run through a CameraManager.
+
+    close() and the context manager release the shared handle; it is reopened
+    on the next call.
+    """
+
+    def __init__(self, manager):
+        self._manager = manager
+
+    def __getattr__(self, name):
+        def method(*args, **kwargs):
+            return self._manager.call(name, *args, **kwargs)
+        method.__name__ = name
+        return method
+
+    def close(self):
+        self._manager.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
-from pylablib.devices import PrincetonInstruments
 
-print(PrincetonInstruments.list_cameras())
+camera_manager = CameraManager()
+cam1 = CameraProxy(camera_manager)
 
-cam1 = PrincetonInstruments.PicamCamera('0809080002')
 
-cam1.set_attribute_value('Exposure Time', 10)
+def __getattr__(name):
+    # Old scripts used PrincetonInstruments from the star import; import it only when asked for
+    if name == 'PrincetonInstruments':
+        return _princeton_instruments()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Stand-in for pylablib's PicamCamera for testing capture code away from the lab.
+
+Implements the subset of the PicamCamera interface the capture tools use:
+get/set_attribute_value for exposure and temperature, grab(), the
+start_acquisition / wait_for_frame / read_oldest_image loop and close().
+Frames are bias + dark current + read noise; exposures take real time and the
+sensor temperature relaxes toward its set point.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+
+class SimulatedCamera:
+
+    def __init__(self, shape=(1024, 1024), bias=600, dark_rate=0.5, read_noise=8.0,
+                 temperature=-70.0, cooling_rate=5.0, seed=None):
+        self.shape = shape
+        self.bias = bias
+        self.dark_rate = dark_rate          # counts / pixel / s
+        self.read_noise = read_noise        # counts rms
+        self.cooling_rate = cooling_rate    # °C / minute
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._temperature = float(temperature)
+        self._temperature_time = time.monotonic()
+        self._attributes = {
+            'Exposure Time': 10,
+            'Sensor Temperature Set Point': float(temperature),
+        }
+        self._acquiring = False
+        self._pending = None
+        self._opened = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._acquiring = False
+        self._opened = False
+
+    def is_opened(self):
+        return self._opened
+
+    # ==================================================
+    # Attributes
+    # ==================================================
+
+    def get_attribute_value(self, name):
+        with self._lock:
+            if name == 'Sensor Temperature Reading':
+                return round(self._update_temperature(), 2)
+            return self._attributes[name]
+
+    def set_attribute_value(self, name, value):
+        with self._lock:
+            if name == 'Sensor Temperature Set Point':
+                self._update_temperature()
+            self._attributes[name] = value
+
+    def _update_temperature(self):
+        now = time.monotonic()
+        step = self.cooling_rate / 60 * (now - self._temperature_time)
+        delta = self._attributes['Sensor Temperature Set Point'] - self._temperature
+        self._temperature += max(-step, min(step, delta))
+        self._temperature_time = now
+        return self._temperature
+
+    # ==================================================
+    # Acquisition
+    # ==================================================
+
+    def _expose(self):
+        exposure_s = self._attributes['Exposure Time'] / 1000
+        time.sleep(exposure_s)
+        dark = self.dark_rate * exposure_s
+        frame = self._rng.normal(self.bias + dark, self.read_noise, self.shape)
+        return np.clip(frame, 0, 65535).astype(np.uint16)
+
+    def grab(self, nframes=1):
+        return [self._expose() for _ in range(nframes)]
+
+    def start_acquisition(self):
+        self._acquiring = True
+
+    def stop_acquisition(self):
+        self._acquiring = False
+
+    def acquisition_in_progress(self):
+        return self._acquiring
+
+    def wait_for_frame(self, timeout=None):
+        self._pending = self._expose()
+
+    def read_oldest_image(self):
+        frame, self._pending = self._pending, None
+        return frame
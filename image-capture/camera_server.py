@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+Local HTTP/WebSocket control service for the PIXIS camera.
+
+    python camera_server.py --simulate            # simulated camera on http://127.0.0.1:8765
+
+HTTP endpoints (JSON bodies and replies):
+    GET  /status                  camera, series and stream telemetry
+    POST /exposure                {"ms": 120}
+    POST /temperature             {"setpoint": -70}
+    POST /series/start            {"script": "5 120 HeNe_darks_120s", "save": true}
+    POST /series/stop
+    GET  /ws                      live stream (WebSocket)
+    GET  /                        minimal browser viewer
+
+The WebSocket sends a JSON text message with telemetry once a second and a
+binary message per displayed frame: a little-endian uint16 height and width
+followed by height*width uint8 pixels (block-averaged, 2-98 percentile
+stretched).
+
+The camera thread only drops frames into a LatestFrameSlot. A single
+broadcaster task takes the newest frame at a capped rate, downsamples and
+encodes it once, and hands the same bytes to every viewer; slow viewers skip
+frames instead of queueing them. Telemetry is polled once for everyone, so
+extra viewers add no load on the camera.
+"""
+
+import argparse
+import asyncio
+import json
+import struct
+import threading
+
+import numpy as np
+from aiohttp import web, WSMsgType
+
+from capture_runner import run_plan, OUTPUT_DIR
+from PIXIS_PICAM_Initialization import CameraManager, CameraProxy, CAMERA_SERIAL, PICAM_DLL
+from frame_display import LatestFrameSlot, RateMeter
+from series_script import compile_series, SeriesError
+
+STREAM_FPS = 5
+STREAM_SIZE = 256           # longest side of streamed frames in pixels
+TELEMETRY_PERIOD = 1.0      # s
+CAMERA_LOCK_TIMEOUT = 0.5   # s telemetry waits for a busy camera before reusing the last reading
+
+
+def downsample(frame, size=STREAM_SIZE):
+    """Block-average a frame so its longest side is at most size, then stretch to uint8."""
+    factor = max(1, int(np.ceil(max(frame.shape) / size)))
+    h, w = frame.shape[0] // factor, frame.shape[1] // factor
+    small = frame[:h * factor, :w * factor].reshape(h, factor, w, factor).mean(axis=(1, 3))
+    lo, hi = np.percentile(small, (2, 98))
+    scaled = np.clip((small - lo) / (hi - lo if hi > lo else 1), 0, 1)
+    return (scaled * 255).astype(np.uint8)
+
+
+def encode_frame(frame):
+    small = downsample(frame)
+    return struct.pack('<HH', *small.shape) + small.tobytes()
+
+
+class CameraService:
+
+    def __init__(self, manager, output_dir=OUTPUT_DIR):
+        self.manager = manager
+        self.camera = CameraProxy(manager)
+        self.output_dir = output_dir
+        self.frame_slot = LatestFrameSlot()
+        self.stream_rate = RateMeter()
+        self.viewers = set()
+
+        self._series_thread = None
+        self._stop_event = threading.Event()
+        self.series = {'state': 'idle', 'frames': 0, 'planned_frames': 0, 'last_event': None, 'errors': None}
+        self.telemetry = {}
+
+    # ==================================================
+    # Camera Control
+    # ==================================================
+
+    def set_exposure(self, ms):
+        self.camera.set_attribute_value('Exposure Time', int(ms))
+
+    def set_temperature(self, setpoint):
+        self.camera.set_attribute_value('Sensor Temperature Set Point', float(setpoint))
+
+    def series_running(self):
+        return self._series_thread is not None and self._series_thread.is_alive()
+
+    def start_series(self, script, save=True):
+        plan = compile_series(script)
+        self._stop_event.clear()
+        self.frame_slot.reset_counters()
+        self.series.update(state='running', frames=0, planned_frames=plan.frame_count,
+                           estimated_s=round(plan.estimated_duration(), 1), errors=None)
+
+        def emit(event, **fields):
+            self.series['last_event'] = dict(fields, event=event)
+            if event == 'frame':
+                self.series['frames'] += 1
+            elif event in ('done', 'stopped'):
+                self.series['state'] = event
+
+        def run():
+            try:
+                run_plan(plan, self.camera, emit, output_dir=self.output_dir, save=save,
+                         stop_event=self._stop_event, on_frame=self.frame_slot.put)
+            except Exception as e:
+                self.series.update(state='failed', errors=[str(e)])
+
+        self._series_thread = threading.Thread(target=run, daemon=True)
+        self._series_thread.start()
+        return plan
+
+    def stop_series(self):
+        self._stop_event.set()
+
+    # ==================================================
+    # Telemetry and Streaming
+    # ==================================================
+
+    def read_telemetry(self):
+        """Poll the camera once for all viewers; reuse old readings if a long exposure holds the camera."""
+        readings = {
+            'temperature': self.manager.poll('get_attribute_value', 'Sensor Temperature Reading', timeout=CAMERA_LOCK_TIMEOUT),
+            'setpoint': self.manager.poll('get_attribute_value', 'Sensor Temperature Set Point', timeout=CAMERA_LOCK_TIMEOUT),
+            'exposure_ms': self.manager.poll('get_attribute_value', 'Exposure Time', timeout=CAMERA_LOCK_TIMEOUT),
+        }
+        self.telemetry.update({key: value for key, value in readings.items() if value is not None})
+        return self.status()
+
+    def status(self):
+        return {
+            'camera': self.telemetry,
+            'series': dict(self.series, running=self.series_running()),
+            'stream': {
+                'viewers': len(self.viewers),
+                'fps': round(self.stream_rate.rate(), 2),
+                'frames_received': self.frame_slot.frames_received,
+                'frames_skipped': self.frame_slot.frames_skipped,
+            },
+        }
+
+    async def broadcast_frames(self):
+        while True:
+            await asyncio.sleep(1 / STREAM_FPS)
+            if not self.viewers:
+                continue
+            frame = self.frame_slot.take()
+            if frame is None:
+                continue
+            payload = await asyncio.to_thread(encode_frame, frame)
+            self.stream_rate.tick()
+            for viewer in list(self.viewers):
+                viewer.offer(payload)
+
+    async def broadcast_telemetry(self):
+        while True:
+            status = await asyncio.to_thread(self.read_telemetry)
+            if self.viewers:
+                message = json.dumps(status)
+                for viewer in list(self.viewers):
+                    viewer.offer(message)
+            await asyncio.sleep(TELEMETRY_PERIOD)
+
+
+class Viewer:
+    """One WebSocket client with a one-deep outbox per message kind, so slow clients drop frames."""
+
+    def __init__(self, ws):
+        self.ws = ws
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+    def offer(self, payload):
+        self.pending[isinstance(payload, bytes)] = payload
+        self.ready.set()
+
+    async def pump(self):
+        while not self.ws.closed:
+            await self.ready.wait()
+            self.ready.clear()
+            pending, self.pending = self.pending, {}
+            for is_binary, payload in pending.items():
+                if is_binary:
+                    await self.ws.send_bytes(payload)
+                else:
+                    await self.ws.send_str(payload)
+
+
+# ==================================================
+# HTTP Handlers
+# ==================================================
+
+async def _json_body(request):
+    # Handlers read fields with body[...] / body.get, so anything but an object is as bad as invalid JSON
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        body = None
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text=json.dumps({'error': 'body must be a JSON object'}),
+                                 content_type='application/json')
+    return body
+
+
+async def handle_status(request):
+    return web.json_response(request.app['service'].status())
+
+
+async def handle_exposure(request):
+    body = await _json_body(request)
+    try:
+        ms = float(body['ms'])
+    except (KeyError, TypeError, ValueError):
+        return web.json_response({'error': "expected {'ms': <number>}"}, status=400)
+    if ms <= 0:
+        return web.json_response({'error': 'exposure must be positive'}, status=400)
+    await asyncio.to_thread(request.app['service'].set_exposure, ms)
+    return web.json_response({'exposure_ms': ms})
+
+
+async def handle_temperature(request):
+    body = await _json_body(request)
+    try:
+        setpoint = float(body['setpoint'])
+    except (KeyError, TypeError, ValueError):
+        return web.json_response({'error': "expected {'setpoint': <number>}"}, status=400)
+    await asyncio.to_thread(request.app['service'].set_temperature, setpoint)
+    return web.json_response({'setpoint': setpoint})
+
+
+async def handle_series_start(request):
+    service = request.app['service']
+    body = await _json_body(request)
+    if service.series_running():
+        return web.json_response({'error': 'a series is already running'}, status=409)
+    try:
+        plan = service.start_series(str(body.get('script', '')), save=bool(body.get('save', True)))
+    except SeriesError as e:
+        return web.json_response({'errors': [{'line': line, 'message': msg} for line, msg in e.errors]}, status=400)
+    return web.json_response({'steps': len(plan.steps), 'frames': plan.frame_count, 'summary': plan.summary()})
+
+
+async def handle_series_stop(request):
+    request.app['service'].stop_series()
+    return web.json_response({'stopping': True})
+
+
+async def handle_ws(request):
+    service = request.app['service']
+    ws = web.WebSocketResponse(heartbeat=30)
+    await ws.prepare(request)
+    viewer = Viewer(ws)
+    service.viewers.add(viewer)
+    viewer.offer(json.dumps(service.status()))
+    pump = asyncio.create_task(viewer.pump())
+    try:
+        async for msg in ws:
+            if msg.type == WSMsgType.ERROR:
+                break
+    finally:
+        service.viewers.discard(viewer)
+        pump.cancel()
+    return ws
+
+
+VIEWER_HTML = """<!doctype html>
+<title>PIXIS live view</title>
+<body style="font-family: Arial; background: #F0F0F0">
+<canvas id="frame" style="width: 512px; image-rendering: pixelated; background: black"></canvas>
+<pre id="telemetry"></pre>
+<script>
+const canvas = document.getElementById('frame'), ctx = canvas.getContext('2d');
+const ws = new WebSocket(`ws://${location.host}/ws`);
+ws.binaryType = 'arraybuffer';
+ws.onmessage = (msg) => {
+    if (typeof msg.data === 'string') {
+        document.getElementById('telemetry').textContent = JSON.stringify(JSON.parse(msg.data), null, 2);
+        return;
+    }
+    const view = new DataView(msg.data), h = view.getUint16(0, true), w = view.getUint16(2, true);
+    const pixels = new Uint8Array(msg.data, 4), image = ctx.createImageData(w, h);
+    for (let i = 0; i < pixels.length; i++) {
+        image.data.set([pixels[i], pixels[i], pixels[i], 255], 4 * i);
+    }
+    canvas.width = w; canvas.height = h;
+    ctx.putImageData(image, 0, 0);
+};
+</script>
+"""
+
+
+async def handle_index(request):
+    return web.Response(text=VIEWER_HTML, content_type='text/html')
+
+
+def create_app(service):
+    app = web.Application()
+    app['service'] = service
+    app.router.add_get('/', handle_index)
+    app.router.add_get('/status', handle_status)
+    app.router.add_post('/exposure', handle_exposure)
+    app.router.add_post('/temperature', handle_temperature)
+    app.router.add_post('/series/start', handle_series_start)
+    app.router.add_post('/series/stop', handle_series_stop)
+    app.router.add_get('/ws', handle_ws)
+
+    async def background(app):
+        tasks = [asyncio.create_task(service.broadcast_frames()),
+                 asyncio.create_task(service.broadcast_telemetry())]
+        yield
+        service.stop_series()
+        for task in tasks:
+            task.cancel()
+
+    app.cleanup_ctx.append(background)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve camera control and a live frame stream over HTTP/WebSocket.")
+    parser.add_argument('--simulate', action='store_true', help='Use the simulated camera')
+    parser.add_argument('--serial', default=CAMERA_SERIAL, help='PIXIS camera serial number')
+    parser.add_argument('--dll', default=PICAM_DLL, help='Path to Picam.dll')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='Directory for saved frames')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to bind (default: localhost only)')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    manager = CameraManager(args.serial, args.dll, args.simulate)
+    try:
+        web.run_app(create_app(CameraService(manager, args.output_dir)), host=args.host, port=args.port)
+    finally:
+        manager.close()
+
+
+if __name__ == '__main__':
+    main()
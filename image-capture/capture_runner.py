@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Headless capture runner.
+
+Runs a series script (see series_script.py) against the PIXIS camera or the
+simulated camera without importing Qt or matplotlib, streaming progress to
+stdout as one JSON object per line.
+
+Examples:
+    python capture_runner.py darks.series
+    echo "5 120 HeNe_darks_120s" | python capture_runner.py --simulate
+    python capture_runner.py --check darks.series
+    python capture_runner.py --watch spool/ --output-dir D:\\darks
+
+In --watch mode the runner acts as a small daemon: every *.series file dropped
+into the spool directory is run in name order and then renamed to .done (or
+.failed), so overnight dark runs can be queued without a display.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+
+from series_script import compile_series, SeriesError, Delay, Exposures, WaitTemperature
+from PIXIS_PICAM_Initialization import CameraManager, CameraProxy, CAMERA_SERIAL, PICAM_DLL
+
+OUTPUT_DIR = "C:\\Users\\Owner\\PICAM\\images"
+
+
+def open_camera(simulate=False, serial=CAMERA_SERIAL, dll=PICAM_DLL):
+    """Camera handle for the real PIXIS or the simulator; the device is only opened on first use."""
+    return CameraProxy(CameraManager(serial, dll, simulate))
+
+
+def json_emitter(stream=sys.stdout):
+    """Return an emit(event, **fields) function writing JSON lines to stream."""
+    lock = threading.Lock()
+
+    def emit(event, **fields):
+        record = {'event': event, 'time': datetime.datetime.now().isoformat(timespec='milliseconds')}
+        record.update(fields)
+        with lock:
+            stream.write(json.dumps(record) + '\n')
+            stream.flush()
+    return emit
+
+
+def save_frame(image, output_dir, target, index):
+    """
+    Write a frame as raw .bin, named by target, time and its index in the run; never overwrites an existing file.
+
+    Returns:
+    - str: Path written; a -1, -2, ... suffix is added if the name is already taken (e.g. by a run started in the
+      same second).
+    """
+    stem = os.path.join(output_dir, f"{target}_{datetime.datetime.now():%Y-%m-%d_%H-%M-%S}_{index:04d}")
+    path, attempt = stem + '.bin', 0
+    while True:
+        try:
+            with open(path, 'xb') as f:
+                image.tofile(f)
+            return path
+        except FileExistsError:
+            attempt += 1
+            path = f"{stem}-{attempt}.bin"
+
+
+def run_plan(plan, camera, emit, output_dir=OUTPUT_DIR, save=True, stop_event=None, on_frame=None):
+    """
+    Execute a compiled SeriesPlan on a camera.
+
+    Parameters:
+    - plan (SeriesPlan): Compiled series.
+    - camera: Camera handle (CameraProxy, PicamCamera or SimulatedCamera).
+    - emit (callable): emit(event, **fields) progress callback.
+    - output_dir (str): Directory frames are saved to as raw .bin files.
+    - save (bool): Save frames to disk.
+    - stop_event (threading.Event): Set to abort between frames (optional).
+    - on_frame (callable): Called with every captured frame (optional).
+
+    Returns:
+    - int: Number of frames captured.
+    """
+    stopped = stop_event.is_set if stop_event is not None else (lambda: False)
+    if save:
+        os.makedirs(output_dir, exist_ok=True)
+
+    frames = 0
+    t0 = time.monotonic()
+    emit('start', steps=len(plan.steps), frames=plan.frame_count,
+         estimated_s=round(plan.estimated_duration(), 1), estimated_bytes=plan.estimated_bytes())
+
+    for index, step in enumerate(plan.steps):
+        if stopped():
+            break
+        emit('step', index=index, line=step.line, kind=type(step).__name__)
+
+        if isinstance(step, Delay):
+            if stop_event is not None:
+                stop_event.wait(step.seconds)
+            else:
+                time.sleep(step.seconds)
+
+        elif isinstance(step, WaitTemperature):
+            camera.set_attribute_value('Sensor Temperature Set Point', step.setpoint)
+            deadline = time.monotonic() + step.timeout
+            while True:
+                reading = camera.get_attribute_value('Sensor Temperature Reading')
+                emit('temperature', reading=reading, setpoint=step.setpoint)
+                if abs(reading - step.setpoint) <= step.tolerance:
+                    break
+                if time.monotonic() > deadline:
+                    emit('warning', message=f'temperature wait on line {step.line} timed out')
+                    break
+                if stopped():
+                    break
+                if stop_event is not None:
+                    stop_event.wait(1)
+                else:
+                    time.sleep(1)
+
+        elif isinstance(step, Exposures):
+            camera.set_attribute_value('Exposure Time', int(step.exposure_ms))
+            target = step.target.strip().replace(" ", "_")
+            for n in range(step.count):
+                if stopped():
+                    break
+                image = camera.grab(1)[0]
+                # Numbered across the whole run: repeated steps would reuse a per-step index within one second
+                path = save_frame(image, output_dir, target, frames) if save else None
+                frames += 1
+                if on_frame is not None:
+                    on_frame(image)
+                emit('frame', target=target, n=n + 1, of=step.count, file=path,
+                     mean=round(float(image.mean()), 2))
+
+    emit('stopped' if stopped() else 'done', frames=frames, elapsed_s=round(time.monotonic() - t0, 2))
+    return frames
+
+
+def run_script(text, camera, emit, **kwargs):
+    """Compile and run a series script; errors are reported as events, not raised."""
+    try:
+        plan = compile_series(text)
+    except SeriesError as e:
+        emit('error', errors=[{'line': line, 'message': msg} for line, msg in e.errors])
+        return False
+    run_plan(plan, camera, emit, **kwargs)
+    return True
+
+
+def watch(spool_dir, camera, emit, poll=5.0, **kwargs):
+    """Run every *.series file appearing in spool_dir, oldest name first, until interrupted."""
+    emit('watching', directory=os.path.abspath(spool_dir))
+    while True:
+        pending = sorted(f for f in os.listdir(spool_dir) if f.endswith('.series'))
+        if not pending:
+            time.sleep(poll)
+            continue
+        path = os.path.join(spool_dir, pending[0])
+        with open(path) as f:
+            text = f.read()
+        emit('script', file=path)
+        ok = run_script(text, camera, emit, **kwargs)
+        os.replace(path, path[:-len('.series')] + ('.done' if ok else '.failed'))
+
+
+def read_script(path):
+    """Series text from a file, or from stdin for '-'."""
+    if path == '-':
+        return sys.stdin.read()
+    with open(path) as f:
+        return f.read()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a capture series without the GUI.")
+    parser.add_argument('script', nargs='?', default='-', help="Series file, or '-' for stdin (default)")
+    parser.add_argument('--simulate', action='store_true', help='Use the simulated camera')
+    parser.add_argument('--serial', default=CAMERA_SERIAL, help='PIXIS camera serial number')
+    parser.add_argument('--dll', default=PICAM_DLL, help='Path to Picam.dll')
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help='Directory for saved frames')
+    parser.add_argument('--no-save', action='store_true', help='Do not write frames to disk')
+    parser.add_argument('--check', action='store_true', help='Only validate the script and print its estimate')
+    parser.add_argument('--watch', metavar='DIR', help='Run *.series files dropped into DIR (daemon mode)')
+    args = parser.parse_args(argv)
+
+    emit = json_emitter()
+
+    if args.check:
+        text = read_script(args.script)
+        try:
+            plan = compile_series(text)
+        except SeriesError as e:
+            emit('error', errors=[{'line': line, 'message': msg} for line, msg in e.errors])
+            return 1
+        emit('plan', steps=len(plan.steps), frames=plan.frame_count, summary=plan.summary(),
+             estimated_s=round(plan.estimated_duration(), 1), estimated_bytes=plan.estimated_bytes())
+        return 0
+
+    camera = open_camera(args.simulate, args.serial, args.dll)
+    options = dict(output_dir=args.output_dir, save=not args.no_save)
+    try:
+        if args.watch:
+            watch(args.watch, camera, emit, **options)
+            return 0
+        text = read_script(args.script)
+        return 0 if run_script(text, camera, emit, **options) else 1
+    except KeyboardInterrupt:
+        emit('interrupted')
+        return 130
+    finally:
+        camera.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
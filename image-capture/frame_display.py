@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Latest-frame-wins display scheduling for the capture GUIs.
+
+The capture thread drops every frame into a single LatestFrameSlot instead of
+emitting it through a queued Qt signal. A DisplayScheduler on the GUI thread
+polls the slot at a capped rate and only repaints when a new frame is waiting,
+so a fast series can never build up a backlog of frame copies.
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class LatestFrameSlot:
+    """
+    Thread-safe single-frame mailbox.
+
+    put() overwrites whatever frame is waiting; take() hands the newest frame
+    to the consumer exactly once. Frames overwritten before they were taken
+    are counted as skipped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._fresh = False
+        self.frames_received = 0
+        self.frames_skipped = 0
+
+    def put(self, frame):
+        with self._lock:
+            if self._fresh:
+                self.frames_skipped += 1
+            self._frame = frame
+            self._fresh = True
+            self.frames_received += 1
+
+    def take(self):
+        """Return the newest frame if one arrived since the last take(), else None."""
+        with self._lock:
+            if not self._fresh:
+                return None
+            self._fresh = False
+            return self._frame
+
+    def peek(self):
+        """Return the newest frame without marking it as consumed."""
+        with self._lock:
+            return self._frame
+
+    def reset_counters(self):
+        with self._lock:
+            self.frames_received = 0
+            self.frames_skipped = 0
+
+
+class RateMeter:
+    """Events per second over a sliding time window."""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self._stamps = deque()
+
+    def tick(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._stamps.append(now)
+        self._trim(now)
+
+    def rate(self, now=None):
+        now = time.monotonic() if now is None else now
+        self._trim(now)
+        if len(self._stamps) < 2:
+            return 0.0
+        span = self._stamps[-1] - self._stamps[0]
+        return (len(self._stamps) - 1) / span if span > 0 else 0.0
+
+    def _trim(self, now):
+        while self._stamps and now - self._stamps[0] > self.window:
+            self._stamps.popleft()
+
+
+class DisplayScheduler:
+    """
+    Repaints the newest frame from a LatestFrameSlot at most max_fps times a second.
+
+    Parameters:
+    - slot (LatestFrameSlot): Slot the capture thread writes frames into.
+    - draw (callable): Called on the GUI thread with the frame to display.
+    - max_fps (float): Upper bound on repaints per second.
+    - parent (QObject): Qt parent for the poll timer.
+
+    PyQt5 is imported on construction so headless tools can share the slot
+    and rate meter without pulling in Qt.
+    """
+
+    def __init__(self, slot, draw, max_fps=10, parent=None):
+        from PyQt5 import QtCore
+
+        self.slot = slot
+        self.draw = draw
+        self.fps_meter = RateMeter()
+        self.timer = QtCore.QTimer(parent)
+        self.timer.timeout.connect(self._poll)
+        self.set_max_fps(max_fps)
+
+    def set_max_fps(self, max_fps):
+        self.max_fps = max_fps
+        self.timer.setInterval(max(1, int(1000 / max_fps)))
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    @property
+    def display_fps(self):
+        return self.fps_meter.rate()
+
+    @property
+    def frames_skipped(self):
+        return self.slot.frames_skipped
+
+    def _poll(self):
+        frame = self.slot.take()
+        if frame is None:
+            return
+        self.draw(frame)
+        self.fps_meter.tick()
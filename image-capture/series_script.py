@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+Parser and planner for capture series scripts.
+
+A series script is plain text, one command per line. The original two
+commands still work unchanged:
+
+    add delay 3                 # sleep 3 s
+    5 120 HeNe_darks_120s       # 5 exposures of 120 ms saved as HeNe_darks_120s
+
+On top of those the language supports:
+
+    set exp = 120               # variables, usable anywhere as $exp or ${exp}
+    wait temp -70               # set the sensor set point and wait until it is reached
+    wait temp -70 within 1 timeout 900
+    repeat 3 as i               # loops, optionally binding the 1-based iteration
+        2 $exp dark_${i}
+        add delay 10
+    end
+
+The whole script is validated before anything runs; every problem is reported
+together with its line number. compile_series() unrolls loops, substitutes
+variables and merges adjacent compatible exposure steps so the camera is
+reconfigured as rarely as possible. No Qt or camera imports live here.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+# Defaults used for time and data estimates
+READOUT_TIME = 1.0                # s of readout/transfer overhead per frame
+COOLING_RATE = 5.0                # °C per minute when changing set point
+START_TEMPERATURE = -70.0         # °C assumed before the first wait step
+FRAME_SHAPE = (1024, 1024)        # PIXIS 1024 sensor
+BYTES_PER_PIXEL = 2               # 16-bit ADC
+
+TEMPERATURE_LIMITS = (-100, 30)   # °C accepted by wait temp
+DEFAULT_TOLERANCE = 2.0           # °C
+DEFAULT_TIMEOUT = 1800.0          # s
+MAX_STEPS = 100000                # guard against runaway loops
+
+_NAME_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_VAR_RE = re.compile(r'\$\{([A-Za-z_][A-Za-z0-9_]*)\}|\$([A-Za-z_][A-Za-z0-9_]*)')
+_TARGET_RE = re.compile(r'^[A-Za-z0-9_.+\-]+$')
+
+
+class SeriesError(ValueError):
+    """Raised with every problem found in a series script."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('\n'.join(f'line {line}: {msg}' for line, msg in errors))
+
+
+# ==================================================
+# Plan Steps
+# ==================================================
+
+@dataclass
+class Delay:
+    seconds: float
+    line: int = 0
+
+
+@dataclass
+class Exposures:
+    count: int
+    exposure_ms: float
+    target: str
+    line: int = 0
+
+
+@dataclass
+class WaitTemperature:
+    setpoint: float
+    tolerance: float = DEFAULT_TOLERANCE
+    timeout: float = DEFAULT_TIMEOUT
+    line: int = 0
+
+
+@dataclass
+class SeriesPlan:
+    steps: list = field(default_factory=list)
+
+    @property
+    def frame_count(self):
+        return sum(step.count for step in self.steps if isinstance(step, Exposures))
+
+    def estimated_duration(self, readout_time=READOUT_TIME, cooling_rate=COOLING_RATE,
+                           start_temperature=START_TEMPERATURE):
+        """Estimated wall time of the series in seconds."""
+        total = 0.0
+        temperature = start_temperature
+        for step in self.steps:
+            if isinstance(step, Delay):
+                total += step.seconds
+            elif isinstance(step, Exposures):
+                total += step.count * (step.exposure_ms / 1000 + readout_time)
+            elif isinstance(step, WaitTemperature):
+                change = max(0.0, abs(step.setpoint - temperature) - step.tolerance)
+                total += min(step.timeout, 60 * change / cooling_rate)
+                temperature = step.setpoint
+        return total
+
+    def estimated_bytes(self, frame_shape=FRAME_SHAPE, bytes_per_pixel=BYTES_PER_PIXEL):
+        """Estimated size of all saved frames in bytes."""
+        return self.frame_count * frame_shape[0] * frame_shape[1] * bytes_per_pixel
+
+    def summary(self, readout_time=READOUT_TIME, cooling_rate=COOLING_RATE, start_temperature=START_TEMPERATURE,
+                frame_shape=FRAME_SHAPE, bytes_per_pixel=BYTES_PER_PIXEL):
+        """One-line description of the plan with its time and data estimates."""
+        duration = self.estimated_duration(readout_time, cooling_rate, start_temperature)
+        size = self.estimated_bytes(frame_shape, bytes_per_pixel)
+        minutes, seconds = divmod(int(round(duration)), 60)
+        hours, minutes = divmod(minutes, 60)
+        return (f"{len(self.steps)} steps, {self.frame_count} frames, "
+                f"~{hours:d}:{minutes:02d}:{seconds:02d}, ~{size / 2**20:.1f} MiB")
+
+
+# ==================================================
+# Parsing
+# ==================================================
+
+def _substitute(token, variables, line, errors):
+    def repl(match):
+        name = match.group(1) or match.group(2)
+        if name not in variables:
+            errors.append((line, f"undefined variable '{name}'"))
+            return match.group(0)
+        return str(variables[name])
+    return _VAR_RE.sub(repl, token)
+
+
+def _number(text, kind, line, errors):
+    try:
+        value = int(text) if kind is int else float(text)
+    except ValueError:
+        errors.append((line, f"expected {'an integer' if kind is int else 'a number'}, got '{text}'"))
+        return None
+    return value
+
+
+def _structure(lines, errors):
+    """Group lines into a tree of ('cmd', line, parts) and ('repeat', line, parts, body) nodes."""
+    root = []
+    stack = [(None, root)]
+    for lineno, raw in lines:
+        parts = raw.split('#', 1)[0].split()
+        if not parts:
+            continue
+        head = parts[0].lower()
+        if head == 'repeat':
+            node = ('repeat', lineno, parts, [])
+            stack[-1][1].append(node)
+            stack.append((lineno, node[3]))
+        elif head == 'end':
+            if len(stack) == 1:
+                errors.append((lineno, "'end' without matching 'repeat'"))
+            else:
+                stack.pop()
+        else:
+            stack[-1][1].append(('cmd', lineno, parts))
+    for lineno, _ in stack[1:]:
+        errors.append((lineno, "'repeat' without matching 'end'"))
+    return root
+
+
+def _evaluate(nodes, variables, errors, steps):
+    for node in nodes:
+        if len(steps) > MAX_STEPS:
+            return
+        if node[0] == 'repeat':
+            _evaluate_repeat(node, variables, errors, steps)
+        else:
+            step = _parse_command(node[1], node[2], variables, errors)
+            if step is not None:
+                steps.append(step)
+
+
+def _evaluate_repeat(node, variables, errors, steps):
+    _, lineno, parts, body = node
+    times, loop_var = None, None
+    if len(parts) not in (2, 4) or (len(parts) == 4 and parts[2].lower() != 'as'):
+        errors.append((lineno, "expected 'repeat <count> [as <name>]'"))
+    else:
+        times = _number(_substitute(parts[1], variables, lineno, errors), int, lineno, errors)
+        if times is not None and times < 0:
+            errors.append((lineno, 'repeat count must not be negative'))
+            times = None
+        if len(parts) == 4:
+            loop_var = parts[3]
+            if not _NAME_RE.match(loop_var):
+                errors.append((lineno, f"invalid variable name '{loop_var}'"))
+                times = None
+
+    if not times:
+        # Still check the body once so its errors are reported, but emit nothing
+        if loop_var is not None:
+            variables.setdefault(loop_var, 1)
+        _evaluate(body, variables, errors, [])
+        return
+
+    for iteration in range(1, times + 1):
+        if loop_var is not None:
+            variables[loop_var] = iteration
+        n_errors = len(errors)
+        _evaluate(body, variables, errors, steps)
+        if len(errors) > n_errors:
+            return  # the same errors would repeat every iteration
+        if len(steps) > MAX_STEPS:
+            errors.append((lineno, f'series expands to more than {MAX_STEPS} steps'))
+            return
+
+
+def _parse_command(lineno, parts, variables, errors):
+    """Parse a single non-loop command into a plan step (or None)."""
+    if parts[0].lower() == 'set':
+        body = ' '.join(parts[1:]).replace('=', ' ', 1).split()
+        if len(body) != 2:
+            errors.append((lineno, "expected 'set <name> = <value>'"))
+        elif not _NAME_RE.match(body[0]):
+            errors.append((lineno, f"invalid variable name '{body[0]}'"))
+        else:
+            variables[body[0]] = _substitute(body[1], variables, lineno, errors)
+        return None
+
+    parts = [_substitute(part, variables, lineno, errors) for part in parts]
+    head = parts[0].lower()
+
+    if head == 'add' and len(parts) > 1 and parts[1].lower() == 'delay':
+        if len(parts) != 3:
+            errors.append((lineno, "expected 'add delay <seconds>'"))
+            return None
+        seconds = _number(parts[2], float, lineno, errors)
+        if seconds is None:
+            return None
+        if seconds < 0:
+            errors.append((lineno, 'delay must not be negative'))
+            return None
+        return Delay(seconds, lineno)
+
+    if head == 'wait':
+        if len(parts) < 3 or parts[1].lower() != 'temp' or len(parts) % 2 == 0:
+            errors.append((lineno, "expected 'wait temp <°C> [within <°C>] [timeout <s>]'"))
+            return None
+        setpoint = _number(parts[2], float, lineno, errors)
+        options = {'within': DEFAULT_TOLERANCE, 'timeout': DEFAULT_TIMEOUT}
+        for key, value in zip(parts[3::2], parts[4::2]):
+            if key.lower() not in options:
+                errors.append((lineno, f"unknown wait option '{key}'"))
+                return None
+            options[key.lower()] = _number(value, float, lineno, errors)
+        if setpoint is None or None in options.values():
+            return None
+        if not TEMPERATURE_LIMITS[0] <= setpoint <= TEMPERATURE_LIMITS[1]:
+            errors.append((lineno, f'set point {setpoint:g} °C outside {TEMPERATURE_LIMITS}'))
+            return None
+        if options['within'] <= 0 or options['timeout'] <= 0:
+            errors.append((lineno, 'tolerance and timeout must be positive'))
+            return None
+        return WaitTemperature(setpoint, options['within'], options['timeout'], lineno)
+
+    if len(parts) == 3:
+        count = _number(parts[0], int, lineno, errors)
+        exposure = _number(parts[1], float, lineno, errors)
+        if count is None or exposure is None:
+            return None
+        if count <= 0:
+            errors.append((lineno, 'exposure count must be positive'))
+        elif exposure <= 0:
+            errors.append((lineno, 'exposure time must be positive'))
+        elif not _TARGET_RE.match(parts[2]):
+            errors.append((lineno, f"invalid target name '{parts[2]}'"))
+        else:
+            return Exposures(count, exposure, parts[2], lineno)
+        return None
+
+    errors.append((lineno, f"unrecognised command '{' '.join(parts)}'"))
+    return None
+
+
+def merge_steps(steps):
+    """Merge adjacent steps that can run as one: same-setting exposures, back-to-back delays."""
+    merged = []
+    for step in steps:
+        previous = merged[-1] if merged else None
+        if isinstance(step, Exposures) and isinstance(previous, Exposures) \
+                and previous.exposure_ms == step.exposure_ms and previous.target == step.target:
+            merged[-1] = Exposures(previous.count + step.count, step.exposure_ms, step.target, previous.line)
+        elif isinstance(step, Delay) and isinstance(previous, Delay):
+            merged[-1] = Delay(previous.seconds + step.seconds, previous.line)
+        elif isinstance(step, WaitTemperature) and isinstance(previous, WaitTemperature):
+            merged[-1] = step
+        elif isinstance(step, Delay) and step.seconds == 0:
+            continue
+        else:
+            merged.append(step)
+    return merged
+
+
+def compile_series(text, variables=None, merge=True):
+    """
+    Validate and compile a series script into a SeriesPlan.
+
+    Parameters:
+    - text (str): Series script.
+    - variables (dict): Initial variable values (optional).
+    - merge (bool): Merge adjacent compatible steps.
+
+    Returns:
+    - SeriesPlan: The flattened execution plan.
+
+    Raises:
+    - SeriesError: Listing every problem found in the script.
+    """
+    lines = list(enumerate(text.splitlines(), start=1))
+    errors = []
+    steps = []
+    _evaluate(_structure(lines, errors), dict(variables or {}), errors, steps)
+    if errors:
+        raise SeriesError(sorted(set(errors)))
+    return SeriesPlan(merge_steps(steps) if merge else steps)
@@ -5,6 +5,8 @@ from astropy.time import Time
 import matplotlib.pyplot as plt
 from astropy.coordinates import EarthLocation, SkyCoord, AltAz, get_sun
 
+from catalogue import load_catalogue, write_catalogue_csv
+
 def calc_nighttime_fracs(GAL_LON, GAL_LAT):
 
     WHITE_SANDS_LOC = EarthLocation(lat=32.50 * u.deg, lon=-106.61 * u.deg, height=1460 * u.m)
@@ -35,11 +37,9 @@ def calc_nighttime_fracs(GAL_LON, GAL_LAT):
 
         return night_fracs
 
-arr = np.genfromtxt('../ob_catalogue/ob_catalogue.csv', delimiter=',', dtype='str')[:,:-1]
+catalogue = load_catalogue()
 
-nighttime_frac_arr = np.zeros((arr.shape[0],6))
-for i in range(arr.shape[0]):
-    nighttime_frac_arr[i,:] = calc_nighttime_fracs(float(arr[i,2]), float(arr[i,3]))
+for i, star in enumerate(catalogue):
+    catalogue['night_frac'][i] = np.array(calc_nighttime_fracs(star['l'], star['b'])).astype('int')
 
-arr = np.column_stack((arr, nighttime_frac_arr.astype('int')))
-np.savetxt('../ob_catalogue/temp_ob_catalogue.csv', arr, delimiter=',', fmt="%s")
\ No newline at end of file
+write_catalogue_csv(catalogue, '../ob_catalogue/temp_ob_catalogue.csv')
\ No newline at end of file
@@ -0,0 +1,185 @@
+"""
+Description:
+Typed access to the OB star catalogue. ob_catalogue.csv stays the human-readable source of truth; the first
+load parses it into a numpy structured array with an explicit schema and caches that as one array per column in
+ob_catalogue.npz, so later loads skip text parsing entirely. The cache records the SHA-256 of the CSV it was
+built from and is rebuilt whenever the CSV changes.
+"""
+
+import functools
+import hashlib
+import os
+import numpy as np
+
+CATALOGUE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ob_catalogue')
+CATALOGUE_CSV = os.path.join(CATALOGUE_DIR, 'ob_catalogue.csv')
+CATALOGUE_NPZ = os.path.join(CATALOGUE_DIR, 'ob_catalogue.npz')
+SPECTRA_DIR = os.path.join(CATALOGUE_DIR, 'ob_catalogue_spectra')
+
+MONTHS = ['Oct', 'Nov', 'Dec', 'Jan', 'Feb', 'Mar']  # night_frac columns, as computed by calc_star_visibility.py
+
+CATALOGUE_DTYPE = np.dtype([
+    ('name', 'U32'),                        # Gaia DR3 identifier where SiMBAD has one, else SiMBAD MAIN_ID
+    ('m_V', 'f8'),                          # apparent V-band magnitude
+    ('l', 'f8'),                            # galactic longitude (deg)
+    ('b', 'f8'),                            # galactic latitude (deg)
+    ('sp_type', 'U16'),                     # SiMBAD spectral type
+    ('quality', 'U1'),                      # SiMBAD spectral type quality (A best - E worst)
+    ('distance', 'f8'),                     # pc, from parallax
+    ('rv', 'f8'),                           # radial velocity (km/s)
+    ('bibcode', 'U19'),                     # spectral type reference; empty once visibilities are added
+    ('night_frac', 'i2', (len(MONTHS),)),   # % of night above the horizon at White Sands; -1 if not computed
+])
+
+# CSV layouts: extract_OB_catalogue.py writes the first, calc_star_visibility.py the second
+_RAW_COLUMNS = ['name', 'm_V', 'l', 'b', 'sp_type', 'quality', 'distance', 'rv', 'bibcode']
+_VISIBILITY_COLUMNS = _RAW_COLUMNS[:-1] + ['night_frac'] * len(MONTHS)
+
+
+def read_catalogue_csv(path=CATALOGUE_CSV):
+    """
+    Parses a catalogue CSV into a structured array with CATALOGUE_DTYPE.
+
+    Parameters:
+    - path (str): CSV written by extract_OB_catalogue.py or calc_star_visibility.py.
+
+    Returns:
+    - np.ndarray: Structured array, one row per star.
+
+    Raises:
+    - ValueError: If the number of columns matches neither layout.
+    """
+    raw = np.loadtxt(path, delimiter=',', dtype='str', ndmin=2, encoding='utf-8')
+    if raw.shape[1] == len(_RAW_COLUMNS):
+        layout = _RAW_COLUMNS
+    elif raw.shape[1] == len(_VISIBILITY_COLUMNS):
+        layout = _VISIBILITY_COLUMNS
+    else:
+        raise ValueError(f"{path} has {raw.shape[1]} columns; expected {len(_RAW_COLUMNS)} or {len(_VISIBILITY_COLUMNS)}")
+
+    catalogue = np.zeros(raw.shape[0], dtype=CATALOGUE_DTYPE)
+    catalogue['night_frac'] = -1
+    for field in CATALOGUE_DTYPE.names:
+        columns = [i for i, name in enumerate(layout) if name == field]
+        if field == 'night_frac' and columns:
+            catalogue[field] = raw[:, columns].astype(float).astype(np.int16)
+        elif columns:
+            catalogue[field] = raw[:, columns[0]]
+    return catalogue
+
+
+def write_catalogue_csv(catalogue, path=CATALOGUE_CSV):
+    """Writes a structured catalogue back out in the calc_star_visibility.py CSV layout."""
+    columns = [catalogue[field].astype('str') for field in _RAW_COLUMNS[:-1]]
+    columns += list(catalogue['night_frac'].T.astype('str'))
+    np.savetxt(path, np.column_stack(columns), delimiter=',', fmt='%s')
+
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def save_catalogue_npz(catalogue, path=CATALOGUE_NPZ, source_sha256=''):
+    """Saves one array per column; written to a temporary file first so readers never see a partial cache."""
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, source_sha256=np.array(source_sha256), **{field: catalogue[field] for field in CATALOGUE_DTYPE.names})
+    os.replace(tmp, path)
+
+
+def load_catalogue_npz(path=CATALOGUE_NPZ):
+    """
+    Reads a cache written by save_catalogue_npz.
+
+    Returns:
+    - tuple: (structured array, SHA-256 of the CSV it was built from), or (None, None) if the cache
+      is missing or was written with a different schema.
+    """
+    try:
+        npz = np.load(path)
+    except (OSError, ValueError):
+        return None, None
+    with npz:
+        if 'source_sha256' not in npz.files or any(field not in npz.files for field in CATALOGUE_DTYPE.names):
+            return None, None
+        catalogue = np.empty(len(npz['name']), dtype=CATALOGUE_DTYPE)
+        for field in CATALOGUE_DTYPE.names:
+            if npz[field].dtype != CATALOGUE_DTYPE[field].base:
+                return None, None
+            catalogue[field] = npz[field]
+        return catalogue, str(npz['source_sha256'])
+
+
+def load_catalogue(csv_path=CATALOGUE_CSV, cache_path=CATALOGUE_NPZ):
+    """
+    Returns the catalogue as a structured array, from the npz cache when it matches the CSV.
+
+    The cache is rebuilt when it is missing, stale or has an old schema. If the CSV is missing the cache
+    is used as is. A read-only checkout just parses the CSV every time.
+
+    Parameters:
+    - csv_path (str): Catalogue CSV.
+    - cache_path (str): Columnar npz cache of csv_path.
+
+    Returns:
+    - np.ndarray: Structured array with CATALOGUE_DTYPE.
+    """
+    catalogue, cached_sha256 = load_catalogue_npz(cache_path)
+    if not os.path.exists(csv_path) and catalogue is not None:
+        return catalogue
+
+    sha256 = _sha256(csv_path)
+    if catalogue is not None and cached_sha256 == sha256:
+        return catalogue
+
+    catalogue = read_catalogue_csv(csv_path)
+    try:
+        save_catalogue_npz(catalogue, cache_path, sha256)
+    except OSError:
+        pass
+    return catalogue
+
+
+def hover_text(catalogue):
+    """Vectorized per-star hover labels (Main_ID, SP_TYPE, m_V, GAL_LAT, GAL_LON)."""
+    parts = ['Main_ID: ', catalogue['name'],
+             '<br>SP_TYPE: ', catalogue['sp_type'],
+             '<br>m_V: ', catalogue['m_V'].astype('str'),
+             '<br>GAL_LAT: ', np.char.mod('%.4f', catalogue['b']),
+             '<br>GAL_LON: ', np.char.mod('%.4f', catalogue['l'])]
+    return functools.reduce(np.char.add, parts)
+
+
+class CatalogueIndex:
+    """
+    Lookups over a loaded catalogue, built once so callbacks never scan it.
+
+    Parameters:
+    - catalogue (np.ndarray): Structured array from load_catalogue().
+    - spectra_dir (str): Directory of IUE spectra saved by extract_IUE_spectra.py as <name>.csv.
+
+    Attributes:
+    - rows (dict): Star name -> row number.
+    - has_spectrum (np.ndarray): Boolean mask of stars with an IUE spectrum in spectra_dir.
+    """
+
+    def __init__(self, catalogue, spectra_dir=SPECTRA_DIR):
+        self.catalogue = catalogue
+        names = catalogue['name'].tolist()
+        self.rows = {name: i for i, name in enumerate(names)}
+
+        spectra = {os.path.splitext(file)[0].replace('_', ' ') for file in os.listdir(spectra_dir)} \
+            if os.path.isdir(spectra_dir) else set()
+        self.has_spectrum = np.array([name in spectra for name in names], dtype=bool)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def __getitem__(self, name):
+        """Catalogue row of the named star; raises KeyError for unknown names."""
+        return self.catalogue[self.rows[name]]
+
+    def spectrum_available(self, name):
+        row = self.rows.get(name)
+        return row is not None and bool(self.has_spectrum[row])
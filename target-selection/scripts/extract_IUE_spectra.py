@@ -13,7 +13,9 @@ from astropy.io import fits
 import numpy as np
 import time
 
-ob_stars = np.genfromtxt('../ob_catalogue/ob_catalogue.csv', delimiter=',', dtype='str')
+from catalogue import load_catalogue
+
+ob_stars = load_catalogue()
 
 # Parse command-line arguments
 parser = argparse.ArgumentParser(description="Query IUE spectra for OB stars.")
@@ -21,12 +23,12 @@ parser.add_argument('--start_target', type=str, help='Specific target name to pr
 args = parser.parse_args()
 
 if args.start_target:
-    ob_stars = ob_stars[np.where(ob_stars[:,0] == args.start_target.replace('_',' '))[0][0]:,:]
+    ob_stars = ob_stars[np.where(ob_stars['name'] == args.start_target.replace('_',' '))[0][0]:]
 
 print('NOTE: takes awhile to run due to MAST query response time')
 t0 = time.time()
 
-for i, (target_name, gal_lon, gal_lat) in enumerate(zip(ob_stars[:,0], ob_stars[:,2], ob_stars[:,3])):
+for i, (target_name, gal_lon, gal_lat) in enumerate(zip(ob_stars['name'], ob_stars['l'], ob_stars['b'])):
     if target_name[:3] == 'GEN': # pound symbols are tough to include in CSVs
         target_name = 'GEN#' + target_name[3:]
 
@@ -34,16 +36,16 @@ for i, (target_name, gal_lon, gal_lat) in enumerate(zip(ob_stars[:,0], ob_stars[
                                           obs_collection="IUE")
 
     if np.array(obs_table).shape[0] == 0:
-        time_left = (time.time() - t0) * (1 / ((i+1) / len(ob_stars[:,0])) - 1)
-        print('failed',target_name,str(int(1000*i/len(ob_stars[:,0])/10))+'%','ETA:',str(int(time_left)),'s')
+        time_left = (time.time() - t0) * (1 / ((i+1) / len(ob_stars)) - 1)
+        print('failed',target_name,str(int(1000*i/len(ob_stars)/10))+'%','ETA:',str(int(time_left)),'s')
         continue
 
     data_products = Observations.get_product_list(obs_table)
     swp_products = data_products[np.char.startswith(np.array(data_products['obs_id']), 'swp')]
 
     if np.array(swp_products).shape[0] == 0:
-        time_left = (time.time() - t0) * (1 / ((i+1) / len(ob_stars[:,0])) - 1)
-        print('failed',target_name,str(int(1000*i/len(ob_stars[:,0])/10))+'%','ETA:',str(int(time_left)),'s')
+        time_left = (time.time() - t0) * (1 / ((i+1) / len(ob_stars)) - 1)
+        print('failed',target_name,str(int(1000*i/len(ob_stars)/10))+'%','ETA:',str(int(time_left)),'s')
         continue
 
     manifest = Observations.download_products(swp_products,
@@ -51,8 +53,8 @@ for i, (target_name, gal_lon, gal_lat) in enumerate(zip(ob_stars[:,0], ob_stars[
                                               extension=".fits")
 
     if manifest is None:
-        time_left = (time.time() - t0) * (1 / ((i+1) / len(ob_stars[:,0])) - 1)
-        print('failed',target_name,str(int(1000*i/len(ob_stars[:,0])/10))+'%','ETA:',str(int(time_left)),'s')
+        time_left = (time.time() - t0) * (1 / ((i+1) / len(ob_stars)) - 1)
+        print('failed',target_name,str(int(1000*i/len(ob_stars)/10))+'%','ETA:',str(int(time_left)),'s')
         continue
 
     filenames = manifest['Local Path']
@@ -71,5 +73,5 @@ for i, (target_name, gal_lon, gal_lat) in enumerate(zip(ob_stars[:,0], ob_stars[
     fmt_name = target_name.replace(' ','_')
     np.savetxt(f'../ob_catalogue/ob_catalogue_spectra/{fmt_name}.csv', data, delimiter=',')
 
-    time_left = (time.time() - t0) * (1 / ((i+1) / len(ob_stars[:,0])) - 1)
-    print('succeeded',target_name,str(int(1000*i/len(ob_stars[:,0])/10))+'%','ETA:',str(int(time_left)),'s')
\ No newline at end of file
+    time_left = (time.time() - t0) * (1 / ((i+1) / len(ob_stars)) - 1)
+    print('succeeded',target_name,str(int(1000*i/len(ob_stars)/10))+'%','ETA:',str(int(time_left)),'s')
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""
+Description:
+Fits every FIMS/SPEAR HEALPix spectrum with the synthetic H2 fluorescence templates from h2_synthesis.py and saves
+all-sky maps of the best-fit temperature, amplitude and goodness of fit.
+
+The model for a pixel is amplitude * template(T) + offset. For a fixed T that is linear in amplitude and offset, so
+the fit is done on a log-spaced grid of temperatures: one matrix product gives the inner products of every spectrum
+with every template, the 2x2 normal equations are solved in closed form for all (pixel, temperature) pairs at once,
+and each pixel keeps the temperature with the smallest residual. Templates are normalised to unit integral, so the
+amplitude is the integrated H2 line flux in map units x Å.
+
+Examples:
+    python fit_h2_maps.py                 # fit and save fims-spear_h2_fit.npz next to the FIMS map
+    python fit_h2_maps.py --temperatures 200
+"""
+
+import argparse
+import hashlib
+import os
+import time
+import numpy as np
+
+from h2_synthesis import SpectrumModel
+
+FIT_MAPS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fims-spear_h2_fit.npz')
+FIT_RANGE = (1390, 1620)    # Å; covers every line in the .peaks files
+N_TEMPERATURES = 100
+CHUNK_PIXELS = 8192         # pixels per matrix product; bounds memory to CHUNK_PIXELS x N_TEMPERATURES
+
+
+def fit_spectra(spectra, templates):
+    """
+    Best amplitude * template + offset for every spectrum, over a set of templates.
+
+    Parameters:
+    - spectra (np.ndarray): (n_spectra, n_wavs) data.
+    - templates (np.ndarray): (n_templates, n_wavs) models.
+
+    Returns:
+    - tuple: (best template index, amplitude, offset, residual sum of squares), each (n_spectra,).
+    """
+    n = templates.shape[1]
+    s_mm = np.einsum('tw,tw->t', templates, templates)
+    s_m1 = templates.sum(axis=1)
+    det = s_mm * n - s_m1**2
+
+    s_dm = spectra @ templates.T                     # (n_spectra, n_templates)
+    s_d1 = spectra.sum(axis=1, keepdims=True)
+    s_dd = np.einsum('pw,pw->p', spectra, spectra)
+
+    amplitude = (n * s_dm - s_m1 * s_d1) / det
+    offset = (s_mm * s_d1 - s_m1 * s_dm) / det
+    rss = s_dd[:, None] - amplitude * s_dm - offset * s_d1
+
+    best = np.argmin(rss, axis=1)
+    rows = np.arange(len(spectra))
+    return best, amplitude[rows, best], offset[rows, best], np.maximum(rss[rows, best], 0)
+
+
+def fit_temperature_maps(fims_map, wavs, n_temperatures=N_TEMPERATURES, fit_range=FIT_RANGE, chunk=CHUNK_PIXELS):
+    """
+    Fits every pixel of a HEALPix spectral cube.
+
+    Parameters:
+    - fims_map (np.ndarray): (npix, n_wavs) cube.
+    - wavs (np.ndarray): Wavelength of each cube bin (Å).
+    - n_temperatures (int): Size of the log-spaced temperature grid between the tabulated models.
+    - fit_range (tuple): Wavelength range (Å) used in the fit.
+    - chunk (int): Pixels fitted per matrix product.
+
+    Returns:
+    - dict: HEALPix maps 'temperature' (K, NaN where the best amplitude is not positive), 'amplitude', 'offset'
+      and 'reduced_chi2' (residual variance per degree of freedom, in map units squared), plus the 'temperatures'
+      grid.
+    """
+    in_range, step, model = _fit_model(wavs, fit_range)
+    wavs = wavs[in_range]
+    temperatures = np.geomspace(model.temperatures[0], model.temperatures[-1], n_temperatures)
+    templates = model(temperatures)
+    templates /= templates.sum(axis=1, keepdims=True) * step
+
+    npix = len(fims_map)
+    maps = {key: np.empty(npix) for key in ('temperature', 'amplitude', 'offset', 'reduced_chi2')}
+    for start in range(0, npix, chunk):
+        spectra = np.asarray(fims_map[start:start + chunk, in_range], dtype=float)
+        best, amplitude, offset, rss = fit_spectra(spectra, templates)
+        pixels = slice(start, start + len(spectra))
+        maps['temperature'][pixels] = np.where(amplitude > 0, temperatures[best], np.nan)
+        maps['amplitude'][pixels] = amplitude
+        maps['offset'][pixels] = offset
+        maps['reduced_chi2'][pixels] = rss / (len(wavs) - 3)
+    maps['temperatures'] = temperatures
+    return maps
+
+
+def _fit_model(wavs, fit_range):
+    """Wavelength mask, bin width and template model the fit uses over fit_range."""
+    in_range = (wavs >= fit_range[0]) & (wavs <= fit_range[1])
+    step = np.median(np.diff(wavs[in_range]))
+    return in_range, step, SpectrumModel(wavs[in_range], instrument_fwhm=step)
+
+
+def fit_stamp(source_path, wavs, n_temperatures=N_TEMPERATURES, fit_range=FIT_RANGE):
+    """
+    Identifies what a set of fit maps was made from: the source file's size and modification time, the temperature
+    grid size, the fit range and a hash of the template table (so edits to h2_synthesis or its line lists count).
+    """
+    stat = os.stat(source_path)
+    _, _, model = _fit_model(wavs, fit_range)
+    templates = hashlib.sha256(model.temperatures.tobytes() + model.templates.tobytes()).hexdigest()
+    return np.array(f"{stat.st_size}:{stat.st_mtime_ns}:{n_temperatures}:{fit_range[0]}-{fit_range[1]}:{templates}")
+
+
+def save_fit_maps(maps, stamp, path=FIT_MAPS_FILE):
+    """Writes fit maps and their stamp atomically, so a reader never sees a partial file."""
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, source_stamp=stamp, **maps)
+    os.replace(tmp, path)
+
+
+def load_fit_maps(fims_map, wavs, source_path, path=FIT_MAPS_FILE, n_temperatures=N_TEMPERATURES,
+                  fit_range=FIT_RANGE):
+    """
+    Fit maps for the cube loaded from source_path, from the cache at path when it was made the same way.
+
+    The fit is rerun, and the cache rewritten, when its fit_stamp differs: the source file's size or modification
+    time, the temperature grid, the fit range or the templates changed.
+    """
+    stamp = fit_stamp(source_path, wavs, n_temperatures, fit_range)
+    try:
+        with np.load(path) as npz:
+            if np.array_equal(npz['source_stamp'], stamp):
+                return {key: npz[key] for key in npz.files if key != 'source_stamp'}
+    except (OSError, KeyError, ValueError):
+        pass
+
+    maps = fit_temperature_maps(fims_map, wavs, n_temperatures, fit_range)
+    try:
+        save_fit_maps(maps, stamp, path)
+    except OSError:
+        pass
+    return maps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit H2 temperature and amplitude maps to the FIMS/SPEAR cube.")
+    parser.add_argument('--temperatures', type=int, default=N_TEMPERATURES, help='Size of the temperature grid')
+    parser.add_argument('--output', type=str, default=FIT_MAPS_FILE, help='Output npz file')
+    args = parser.parse_args()
+
+    from load_fims_spear_maps import FIMS_MAP_FILE, fims_map, h2_wavs
+
+    t0 = time.time()
+    maps = fit_temperature_maps(fims_map, h2_wavs, n_temperatures=args.temperatures)
+    save_fit_maps(maps, fit_stamp(FIMS_MAP_FILE, h2_wavs, n_temperatures=args.temperatures), args.output)
+
+    detected = np.isfinite(maps['temperature'])
+    print(f"Fitted {len(fims_map)} pixels against {args.temperatures} templates in {time.time() - t0:.1f} s")
+    print(f"{detected.sum()} pixels with positive amplitude; median T = {np.nanmedian(maps['temperature']):.0f} K")
+    print(f"Saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Description:
+Synthetic H2 fluorescence spectra from the theoretical line lists in ../theoretical_spectra/uncor_<T>K.peaks
+(Gaussian fits to model spectra from Dr. Erika Hamden). Each peaks file is parsed once into a structured array of
+lines. Spectra are rendered by summing Gaussians, but each line is only evaluated on the pixels within
+LINE_WINDOW widths of its centre, so the cost scales with lines x local pixels instead of lines x grid size.
+
+SpectrumModel precomputes one template per tabulated temperature on a fixed wavelength grid; a model at any
+temperature in between is a linear blend of the two neighbouring templates (in log T), which makes rendering
+thousands of spectra per second a matter of a few array operations.
+"""
+
+import functools
+import glob
+import os
+import re
+import numpy as np
+
+PEAKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'theoretical_spectra')
+
+LINE_DTYPE = np.dtype([
+    ('center', 'f8'),   # Å
+    ('height', 'f8'),   # peak height, arbitrary flux units
+    ('area', 'f8'),     # integrated flux, same units x Å
+    ('fwhm', 'f8'),     # Å
+])
+
+LINE_WINDOW = 5         # lines are evaluated out to this many Gaussian sigmas
+MAX_LINE_FWHM = 1.0     # Å; wider "lines" in the peaks files are diverged fits and are dropped
+
+FWHM_TO_SIGMA = 1 / (2 * np.sqrt(2 * np.log(2)))
+
+
+def read_peaks(path):
+    """
+    Parses one .peaks file into a structured array sorted by centre.
+
+    Rows are '<id>  Gaussian  Center  Height  Area  FWHM  <fit parameters>'. Fits that diverged (non-finite or
+    non-positive height, width outside (0, MAX_LINE_FWHM]) are dropped.
+
+    Parameters:
+    - path (str): Path to a .peaks file.
+
+    Returns:
+    - np.ndarray: Lines with LINE_DTYPE.
+    """
+    rows = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 6 or fields[0].startswith('#') or fields[1] != 'Gaussian':
+                continue
+            rows.append(tuple(float(value) for value in fields[2:6]))
+
+    lines = np.array(rows, dtype=LINE_DTYPE)
+    good = np.isfinite(lines['center']) & np.isfinite(lines['height']) & (lines['height'] > 0) \
+        & (lines['fwhm'] > 0) & (lines['fwhm'] <= MAX_LINE_FWHM)
+    lines = lines[good]
+    return lines[np.argsort(lines['center'])]
+
+
+@functools.lru_cache(maxsize=None)
+def load_line_lists(directory=PEAKS_DIR):
+    """
+    All uncor_<T>K.peaks files in directory, parsed once per process.
+
+    Returns:
+    - dict: Temperature (K) -> line array, in increasing temperature.
+    """
+    line_lists = {}
+    for path in glob.glob(os.path.join(directory, 'uncor_*K.peaks')):
+        match = re.search(r'uncor_(\d+)K\.peaks$', path)
+        if match:
+            line_lists[int(match.group(1))] = read_peaks(path)
+    return dict(sorted(line_lists.items()))
+
+
+def render_spectrum(lines, wavs, instrument_fwhm=0.0, window=LINE_WINDOW):
+    """
+    Sum of Gaussian lines on a wavelength grid.
+
+    Parameters:
+    - lines (np.ndarray): Line list with LINE_DTYPE.
+    - wavs (np.ndarray): Increasing wavelength grid (Å); need not be uniform.
+    - instrument_fwhm (float): Instrumental FWHM (Å) added in quadrature to every line width.
+    - window (float): Half-width, in Gaussian sigmas, of the pixels each line is evaluated on.
+
+    Returns:
+    - np.ndarray: Flux on wavs, in the peak-height units of the line list.
+    """
+    wavs = np.asarray(wavs, dtype=float)
+    sigma = np.sqrt(lines['fwhm']**2 + instrument_fwhm**2) * FWHM_TO_SIGMA
+    # Keep the line's area when it is broadened
+    height = lines['height'] * lines['fwhm'] / np.sqrt(lines['fwhm']**2 + instrument_fwhm**2)
+
+    lo = np.searchsorted(wavs, lines['center'] - window * sigma, side='left')
+    hi = np.searchsorted(wavs, lines['center'] + window * sigma, side='right')
+    span = int((hi - lo).max(initial=0))
+    if span == 0:
+        return np.zeros_like(wavs)
+
+    pixels = lo[:, None] + np.arange(span)
+    inside = pixels < hi[:, None]
+    pixels = np.minimum(pixels, len(wavs) - 1)
+    profile = height[:, None] * np.exp(-0.5 * ((wavs[pixels] - lines['center'][:, None]) / sigma[:, None])**2)
+    return np.bincount(pixels[inside], weights=profile[inside], minlength=len(wavs))
+
+
+class SpectrumModel:
+    """
+    Precomputed H2 fluorescence templates on one wavelength grid.
+
+    Parameters:
+    - wavs (np.ndarray): Increasing wavelength grid (Å).
+    - instrument_fwhm (float): Instrumental FWHM (Å); use about the grid spacing for binned data like FIMS.
+    - line_lists (dict): Temperature -> line array (default: load_line_lists()).
+
+    Attributes:
+    - temperatures (np.ndarray): Tabulated temperatures (K).
+    - templates (np.ndarray): (n_temperatures, n_wavs) rendered spectra.
+    """
+
+    def __init__(self, wavs, instrument_fwhm=0.0, line_lists=None):
+        line_lists = load_line_lists() if line_lists is None else line_lists
+        self.wavs = np.asarray(wavs, dtype=float)
+        self.temperatures = np.array(list(line_lists), dtype=float)
+        self.templates = np.stack([render_spectrum(lines, self.wavs, instrument_fwhm) for lines in line_lists.values()])
+        self._log_t = np.log(self.temperatures)
+
+    def weights(self, temperature):
+        """
+        Template blending weights for one or more temperatures, linear in log T.
+
+        Temperatures outside the tabulated range are clipped to it.
+
+        Returns:
+        - np.ndarray: (..., n_temperatures) weights; each row sums to 1.
+        """
+        log_t = np.clip(np.log(np.asarray(temperature, dtype=float)), self._log_t[0], self._log_t[-1])
+        upper = np.clip(np.searchsorted(self._log_t, log_t, side='right'), 1, len(self._log_t) - 1)
+        frac = (log_t - self._log_t[upper - 1]) / (self._log_t[upper] - self._log_t[upper - 1])
+        weights = np.zeros(log_t.shape + (len(self._log_t),))
+        np.put_along_axis(weights, (upper - 1)[..., None], (1 - frac)[..., None], axis=-1)
+        np.put_along_axis(weights, upper[..., None], frac[..., None], axis=-1)
+        return weights
+
+    def __call__(self, temperature, amplitude=1.0):
+        """
+        Model spectra at the given temperature(s), scaled by amplitude.
+
+        Scalar arguments give one spectrum; arrays broadcast and give (..., n_wavs).
+        """
+        temperature, amplitude = np.broadcast_arrays(np.asarray(temperature, dtype=float), np.asarray(amplitude, dtype=float))
+        return amplitude[..., None] * (self.weights(temperature) @ self.templates)
@@ -0,0 +1,83 @@
+"""
+Description:
+Multi-resolution HEALPix maps. A RING-ordered map is reordered to NESTED once and degraded level by level the way
+healpy's ud_grade does it: in NESTED order the four children of pixel p are 4p..4p+3, so every coarser level is a
+reshape and a mean over the children (NaN children are left out). Queries pick the coarsest level whose pixels are
+no larger than the requested resolution, so whole-sky renders read a few thousand pixels and zoomed views read the
+native map.
+"""
+
+import healpy as hp
+import numpy as np
+
+MIN_NSIDE = 4
+
+
+def degrade_nested(nested_map):
+    """
+    One ud_grade step down (nside -> nside / 2) of a NESTED map, ignoring NaN pixels in the means.
+
+    Parameters:
+    - nested_map (np.ndarray): (npix, ...) map in NESTED order; trailing axes (e.g. wavelength) are kept.
+
+    Returns:
+    - np.ndarray: (npix / 4, ...) float map.
+    """
+    children = np.asarray(nested_map, dtype=float).reshape((-1, 4) + nested_map.shape[1:])
+    finite = np.isfinite(children)
+    counts = finite.sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        return np.where(finite, children, 0).sum(axis=1) / counts
+
+
+class MultiResolutionMap:
+    """
+    A HEALPix map held at every nside from its native one down to min_nside.
+
+    Parameters:
+    - ring_map (np.ndarray): (npix, ...) RING-ordered map.
+    - min_nside (int): Coarsest level kept.
+
+    Attributes:
+    - nside (int): Native nside.
+    - levels (dict): nside -> NESTED map, finest first.
+    """
+
+    def __init__(self, ring_map, min_nside=MIN_NSIDE):
+        self.nside = hp.npix2nside(len(ring_map))
+        nested = np.asarray(ring_map)[hp.nest2ring(self.nside, np.arange(len(ring_map)))]
+        self.levels = {self.nside: nested}
+        nside = self.nside
+        while nside > min_nside:
+            nested = degrade_nested(nested)
+            nside //= 2
+            self.levels[nside] = nested
+        # Pixel sizes (deg) of the levels, finest first
+        self._resolutions = {nside: np.degrees(hp.nside2resol(nside)) for nside in self.levels}
+
+    def nside_for(self, resolution=None):
+        """Coarsest nside whose pixels are no larger than resolution (deg); the native nside if none are."""
+        if resolution is None:
+            return self.nside
+        fitting = [nside for nside, size in self._resolutions.items() if size <= resolution]
+        return min(fitting) if fitting else self.nside
+
+    def sample(self, l, b, resolution=None):
+        """
+        Map values at galactic positions, all at once, from the level that matches resolution.
+
+        Parameters:
+        - l (np.ndarray): Galactic longitudes (deg).
+        - b (np.ndarray): Galactic latitudes (deg).
+        - resolution (float): Largest acceptable pixel size (deg); None reads the native map.
+
+        Returns:
+        - np.ndarray: Values with the broadcast shape of l and b (plus any trailing map axes).
+        """
+        nside = self.nside_for(resolution)
+        return self.levels[nside][hp.ang2pix(nside, l, b, nest=True, lonlat=True)]
+
+    def grid(self, lons, lats, resolution=None):
+        """Values on the (len(lats), len(lons)) lat/lon grid spanned by the two axes, latitude first."""
+        lon_grid, lat_grid = np.meshgrid(lons, lats)
+        return self.sample(lon_grid, lat_grid, resolution)
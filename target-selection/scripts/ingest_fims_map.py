@@ -0,0 +1,185 @@
+"""
+Description:
+Streaming ingest of a FIMS/SPEAR HEALPix FITS map (e.g. the MAST
+mccm_fims-spear_fims-ap100-n064_sky-starless_long_v1.0_hp-map-hsi.fits.gz product) into the compact
+fims-spear_map.npz read by load_fims_spear_maps.py.
+
+The (gzipped) file is read as a stream: the binary-table header is parsed, the row layout is rebuilt from the TFORMn
+keywords, and rows are decompressed CHUNK_ROWS at a time; only the requested column is cast and copied into the
+output array. Peak memory is the output array plus one chunk, instead of the whole table with masked columns.
+The product is written to a temporary file and renamed into place, and records CRVAL1/CDELT1, the HEALPix nside
+and the SHA-256 of the source file.
+
+Examples:
+    python ingest_fims_map.py mccm_fims-spear_fims-ap100-n064_sky-starless_long_v1.0_hp-map-hsi.fits.gz
+    python ingest_fims_map.py map.fits.gz --column INTEN --output fims-spear_map.npz
+"""
+
+import argparse
+import gzip
+import hashlib
+import os
+import re
+import time
+import healpy as hp
+import numpy as np
+from astropy.io import fits
+
+FIMS_MAP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fims-spear_map.npz')
+COLUMN = 'INTEN_BSUB'
+CHUNK_ROWS = 4096
+BLOCK = 2880        # FITS block size (bytes)
+
+# FITS binary-table TFORM letter -> big-endian numpy type
+TFORM_DTYPES = {'L': 'i1', 'B': 'u1', 'I': '>i2', 'J': '>i4', 'K': '>i8', 'E': '>f4', 'D': '>f8',
+                'C': '>c8', 'M': '>c16', 'A': 'S1'}
+
+
+def tform_dtype(tform):
+    """
+    numpy dtype of one binary-table field, e.g. '360E' -> ('>f4', (360,)), '20A' -> 'S20'.
+
+    Raises:
+    - ValueError: For variable-length ('P'/'Q') and bit ('X') columns, which this reader does not support.
+    """
+    match = re.fullmatch(r'\s*(\d*)([LXBIJKAEDCMPQ])\S*\s*', tform)
+    if match is None or match.group(2) not in TFORM_DTYPES:
+        raise ValueError(f"unsupported TFORM {tform!r}")
+    repeat = int(match.group(1)) if match.group(1) else 1
+    code = match.group(2)
+    if code == 'A':
+        return np.dtype(f'S{repeat}')
+    return np.dtype((TFORM_DTYPES[code], (repeat,))) if repeat != 1 else np.dtype(TFORM_DTYPES[code])
+
+
+def row_dtype(header):
+    """Structured dtype of one binary-table row from the TTYPEn/TFORMn keywords of its header."""
+    fields = [(header.get(f'TTYPE{i}', f'COL{i}').strip(), tform_dtype(header[f'TFORM{i}']))
+              for i in range(1, header['TFIELDS'] + 1)]
+    dtype = np.dtype(fields)
+    if dtype.itemsize != header['NAXIS1']:
+        raise ValueError(f"row layout from TFORMn is {dtype.itemsize} bytes but NAXIS1 is {header['NAXIS1']}")
+    return dtype
+
+
+def file_sha256(path, block_size=1 << 20):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _open_stream(path):
+    with open(path, 'rb') as f:
+        gzipped = f.read(2) == b'\x1f\x8b'
+    return gzip.open(path, 'rb') if gzipped else open(path, 'rb')
+
+
+def _skip_data(stream, header):
+    """Skips the (padded) data unit that follows header in the stream."""
+    naxis = header.get('NAXIS', 0)
+    size = 0
+    if naxis:
+        size = abs(header['BITPIX']) // 8 * header.get('GCOUNT', 1) * (header.get('PCOUNT', 0) + int(np.prod(
+            [header[f'NAXIS{i}'] for i in range(1, naxis + 1)])))
+    padded = -(-size // BLOCK) * BLOCK
+    while padded:
+        padded -= len(stream.read(min(padded, 1 << 20)))
+
+
+def read_column(path, column=COLUMN, dtype=np.int32, chunk_rows=CHUNK_ROWS, extension=1):
+    """
+    Streams one column of a binary-table HEALPix map into a RING-ordered array.
+
+    Non-finite values and TNULL integers become 0 (a plain cast would turn NaN into INT_MIN). TSCALn and
+    TZEROn are applied before the cast. NESTED maps are written to their RING positions as the rows arrive.
+
+    Parameters:
+    - path (str): FITS file, optionally gzipped.
+    - column (str): Column name (TTYPEn).
+    - dtype (np.dtype): Output type.
+    - chunk_rows (int): Rows decompressed and converted at a time.
+    - extension (int): Index of the binary-table HDU.
+
+    Returns:
+    - tuple: (array of shape (n_rows, repeat), header of the table HDU).
+
+    Raises:
+    - KeyError: If the column does not exist.
+    - ValueError: If the table layout is not supported.
+    """
+    with _open_stream(path) as stream:
+        for _ in range(extension):
+            _skip_data(stream, fits.Header.fromfile(stream, padding=True))
+        header = fits.Header.fromfile(stream, padding=True)
+
+        rows = row_dtype(header)
+        if column not in rows.names:
+            raise KeyError(f"column {column!r} not in {rows.names}")
+        index = rows.names.index(column) + 1
+        scale, zero = header.get(f'TSCAL{index}', 1.0), header.get(f'TZERO{index}', 0.0)
+        null = header.get(f'TNULL{index}')
+        field_shape = rows[column].shape
+
+        n_rows = header['NAXIS2']
+        nside = hp.npix2nside(n_rows) if header.get('ORDERING', 'RING').strip().upper() == 'NESTED' else None
+        out = np.empty((n_rows,) + field_shape, dtype=dtype)
+
+        for start in range(0, n_rows, chunk_rows):
+            count = min(chunk_rows, n_rows - start)
+            buffer = stream.read(count * rows.itemsize)
+            if len(buffer) != count * rows.itemsize:
+                raise ValueError(f"{path} ends after {start} of {n_rows} rows")
+            values = np.frombuffer(buffer, dtype=rows)[column]
+            bad = values == null if null is not None else None
+            values = values * scale + zero if (scale, zero) != (1.0, 0.0) else values.astype(float, copy=False)
+            bad = ~np.isfinite(values) if bad is None else bad | ~np.isfinite(values)
+            values = np.where(bad, 0, values)
+
+            target = np.arange(start, start + count)
+            out[hp.nest2ring(nside, target) if nside else target] = values
+
+    return out, header
+
+
+def ingest(path, output, column=COLUMN, chunk_rows=CHUNK_ROWS):
+    """
+    Writes the compact map product read by load_fims_spear_maps.py, atomically.
+
+    The npz holds 'array' (npix, n_wavs) int32, 'header' [CRVAL1, CDELT1], 'nside', 'column' and 'source_sha256'.
+
+    Returns:
+    - dict: What was written, without the array.
+    """
+    array, header = read_column(path, column, np.int32, chunk_rows)
+    meta = dict(
+        header=np.array([header['CRVAL1'], header['CDELT1']]),
+        nside=np.array(hp.npix2nside(len(array))),
+        column=np.array(column),
+        source_sha256=np.array(file_sha256(path)),
+    )
+    tmp = output + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez_compressed(f, array=array, **meta)
+    os.replace(tmp, output)
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a FIMS/SPEAR HEALPix FITS map into the compact npz product.")
+    parser.add_argument('source', type=str, help='FITS map (.fits or .fits.gz)')
+    parser.add_argument('--column', type=str, default=COLUMN, help='Intensity column to extract')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Rows converted at a time')
+    parser.add_argument('--output', type=str, default=FIMS_MAP_FILE, help='Output npz file')
+    args = parser.parse_args()
+
+    t0 = time.time()
+    meta = ingest(args.source, args.output, args.column, args.chunk_rows)
+    print(f"Ingested {args.column} (nside {int(meta['nside'])}, CRVAL1={meta['header'][0]}, CDELT1={meta['header'][1]}) "
+          f"in {time.time() - t0:.1f} s")
+    print(f"Source SHA-256 {meta['source_sha256']}; saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,26 @@
 import os
 import numpy as np
 import healpy as hp
-from astropy.io import fits
 import matplotlib.pyplot as plt
-from astropy.table import Table
 from astroquery.mast import Observations
 
+# FIMS_MAP_FILE is next to the scripts, so the map loads from any working directory (the visualizer, the ranking CLI)
+from ingest_fims_map import FIMS_MAP_FILE, ingest
+
 download_data = False
 
 if download_data:
     map_name = 'mccm_fims-spear_fims-ap100-n064_sky-starless_long_v1.0_hp-map-hsi.fits.gz'
     uri = 'mast:MCCM/fims-spear/fims/hp-map-hsi/'+map_name
     Observations.download_file(uri)
-    file_highres = os.path.basename(uri)
-    
-    with fits.open(map_name) as hdul:
-        header = hdul[1].header
-
-    fims_map = Table.read(map_name, hdu=1).filled(np.nan)['INTEN_BSUB']
-    data = np.array(fims_map).astype(np.int32)
-    header = np.array([header['CRVAL1'], header['CDELT1']])
 
-    np.savez_compressed('../fims-spear_map.npz', header=header, array=data)
+    # Streams INTEN_BSUB out of the gzipped table in row chunks (see ingest_fims_map.py)
+    ingest(map_name, FIMS_MAP_FILE)
     os.remove(map_name)
 
 # ######################
 
-npz = np.load('../fims-spear_map.npz')
+npz = np.load(FIMS_MAP_FILE)
 header = npz['header']
 fims_map = npz['array']
 
@@ -35,8 +29,95 @@ cdelt = header[1]
 bins = len(fims_map[0])
 h2_wavs = np.arange(0, bins)*cdelt+crval
 
-mask = ((h2_wavs > 1395) & (h2_wavs < 1405)) | ((h2_wavs > 1605) & (h2_wavs < 1615))
-integrated_h2_map = np.sum(fims_map[:,mask], axis=1)
+# Prefix sums along wavelength: the flux between bins i and j of every pixel is
+# cumulative_map[:, j] - cumulative_map[:, i], so any band integrates in O(npix)
+# without touching the cube. int32 is enough unless the whole spectrum could overflow it.
+# The bound is computed in Python ints: in the map's own dtype the product (or abs of the most negative value) could
+# itself overflow and pass the check.
+fits_int32 = int(np.abs(fims_map.astype(np.int64)).max()) * bins < np.iinfo(np.int32).max
+cumulative_map = np.zeros((fims_map.shape[0], bins + 1), dtype=np.int32 if fits_int32 else np.int64)
+np.cumsum(fims_map, axis=1, out=cumulative_map[:, 1:])
+
+H2_BANDS = ((1395, 1405), (1605, 1615))   # Å
+
+def band_slices(bands, wavs=h2_wavs):
+    """
+    Bin ranges [start, stop) of the bins strictly inside each (low, high) band.
+
+    Overlapping or touching bands are merged so no bin is counted twice.
+    """
+    ranges = sorted((np.searchsorted(wavs, low, side='right'), np.searchsorted(wavs, high, side='left'))
+                    for low, high in bands)
+    merged = []
+    for start, stop in ranges:
+        if stop <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+    return [tuple(r) for r in merged]
+
+def integrate_bands(bands, cumulative=cumulative_map, wavs=h2_wavs):
+    """
+    Per-pixel sum of the FIMS/SPEAR map over a set of wavelength bands, from the prefix sums.
+
+    Parameters:
+    - bands (iterable): (low, high) wavelength pairs in Å; bins strictly between low and high are summed.
+    - cumulative (np.ndarray): Prefix sums of the map along wavelength, with a leading zero column.
+    - wavs (np.ndarray): Wavelength of each map bin (Å).
+
+    Returns:
+    - np.ndarray: Integrated map, one value per HEALPix pixel.
+    """
+    total = np.zeros(cumulative.shape[0], dtype=np.int64)
+    for start, stop in band_slices(bands, wavs):
+        total += cumulative[:, stop]
+        total -= cumulative[:, start]
+    return total
+
+integrated_h2_map = integrate_bands(H2_BANDS)
+
+# One compact row per HEALPix pixel with what the click and hover panels show, so
+# they never have to scan a spectrum: extrema, the flux in each H2 band, the peak
+# wavelength and a robust SNR proxy, (max - median) / (1.4826 * MAD).
+PIXEL_SUMMARY_DTYPE = np.dtype([
+    ('min', 'i4'),
+    ('max', 'i4'),
+    ('band_flux', 'i8', (len(H2_BANDS),)),
+    ('peak_wav', 'f4'),
+    ('snr', 'f4'),
+])
+
+def summarize_pixels(cube=fims_map, wavs=h2_wavs, bands=H2_BANDS, cumulative=cumulative_map):
+    """
+    Per-pixel summary table of a HEALPix spectral cube.
+
+    Parameters:
+    - cube (np.ndarray): (npix, n_wavs) map.
+    - wavs (np.ndarray): Wavelength of each map bin (Å).
+    - bands (iterable): (low, high) bands in Å; band_flux has one column per band, in this order.
+    - cumulative (np.ndarray): Prefix sums of cube along wavelength (see cumulative_map).
+
+    Returns:
+    - np.ndarray: One PIXEL_SUMMARY_DTYPE row per pixel (band_flux is sized for H2_BANDS).
+    """
+    summary = np.empty(len(cube), dtype=PIXEL_SUMMARY_DTYPE)
+    summary['min'] = cube.min(axis=1)
+    summary['max'] = cube.max(axis=1)
+    for i, band in enumerate(bands):
+        summary['band_flux'][:, i] = integrate_bands([band], cumulative, wavs)
+    summary['peak_wav'] = wavs[np.argmax(cube, axis=1)]
+
+    # Partition-based medians (the upper median for an even bin count) are ~4x faster than np.median
+    mid = cube.shape[1] // 2
+    median = np.partition(cube, mid, axis=1)[:, mid]
+    mad = np.partition(np.abs(cube - median[:, None]), mid, axis=1)[:, mid]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        summary['snr'] = np.where(mad > 0, (summary['max'] - median) / (1.4826 * mad), np.nan)
+    return summary
+
+pixel_summary = summarize_pixels()
 
 #######################
 
@@ -45,62 +126,42 @@ def get_healpy_map_value(lat, lon, map_array, coord_order='G', dims=3):
     Retrieves the value from a HEALPix map at the specified latitude and longitude.
 
     Parameters:
-    - lat (float): Latitude in degrees (-90 to 90).
-    - lon (float): Longitude in degrees (0 to 360).
-    - map_array (array-like): 1D array representing the HEALPix map.
+    - lat (float or np.ndarray): Latitude in degrees (-90 to 90).
+    - lon (float or np.ndarray): Longitude in degrees (0 to 360).
+    - map_array (array-like): RING-ordered HEALPix map, (npix,) or (npix, n_wavs).
     - coord_order (str): Coordinate system of the map ('G' for Galactic, 'C' for Celestial).
 
     Returns:
-    - float: The value from the map at the specified coordinates.
+    - float or np.ndarray: The value (spectrum when dims == 3) at each position.
 
     Raises:
-    - ValueError: If the map length is not compatible with a valid nside.
+    - ValueError: If the map length is not 12*nside^2 with nside a power of 2.
     """
-    # Calculate nside from the length of the map
-    if dims == 3:
-        npix = len(map_array[:,0])
-    else:
-        npix = len(map_array)
-    nside_float = np.sqrt(npix / 12)
-    nside = int(nside_float)
-
-    if not hp.isnsideok(nside):
-        raise ValueError(f"Invalid nside calculated from map length {npix}. Ensure the length is 12*nside^2 with nside as a power of 2.")
-
-    # Convert latitude and longitude to theta and phi in radians
-    theta = np.radians(90.0 - lat)  # colatitude
-    phi = np.radians(lon)            # longitude
-
-    # Get the pixel index
-    pix = hp.ang2pix(nside, theta, phi, nest=False)
-
-    # Return the map value at the pixel
-    if dims == 3:
-        return map_array[pix,:]
-    else:
-        return map_array[pix]
+    # npix2nside validates the length and is cached by healpy, so repeated calls are cheap
+    nside = hp.npix2nside(len(map_array))
+    pix = hp.ang2pix(nside, lon, lat, nest=False, lonlat=True)
+    return map_array[pix]
 
-def resample_3d_array(wavs, map_3d, pix_per_grid=1):
+def healpix_grid_index(npix, pix_per_grid=1):
+    """
+    HEALPix pixel under every cell of the lat/lon grid used by resample_2d_array, in one vectorized call.
 
-    regrid = np.zeros((pix_per_grid*180,pix_per_grid*360,wavs.shape[0]))
-    lats = np.linspace(-90,90,regrid.shape[0])
-    lons = np.linspace(0,360,regrid.shape[1])
-    for lat in range(regrid.shape[0]):
-        for lon in range(regrid.shape[1]):
-            regrid[lat,lon,:] = get_healpy_map_value(lats[lat],lons[lon],map_3d)
+    map_array[healpix_grid_index(len(map_array))] regrids any RING-ordered map.
+    """
+    nside = hp.npix2nside(npix)
+    lats = np.linspace(-90,90,pix_per_grid*180)
+    lons = np.linspace(0,360,pix_per_grid*360)
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+    return hp.ang2pix(nside, np.radians(90.0 - lat_grid), np.radians(lon_grid), nest=False)
 
-    return regrid
+def resample_3d_array(wavs, map_3d, pix_per_grid=1):
+    """(180*pix_per_grid, 360*pix_per_grid, n_wavs) nearest-pixel regrid of a RING-ordered spectral map."""
+    return np.asarray(map_3d, dtype=float)[healpix_grid_index(len(map_3d), pix_per_grid)]
 
 def resample_2d_array(map_2d, pix_per_grid=1):
+    """(180*pix_per_grid, 360*pix_per_grid) nearest-pixel regrid of a RING-ordered map."""
+    return np.asarray(map_2d, dtype=float)[healpix_grid_index(len(map_2d), pix_per_grid)]
 
-    regrid = np.zeros((pix_per_grid*180,pix_per_grid*360))
-    lats = np.linspace(-90,90,regrid.shape[0])
-    lons = np.linspace(0,360,regrid.shape[1])
-    for lat in range(regrid.shape[0]):
-        for lon in range(regrid.shape[1]):
-            regrid[lat,lon] = get_healpy_map_value(lats[lat],lons[lon],map_2d,dims=2)
-
-    return regrid
-
+# Lat/lon grid version for grid consumers (rank_targets); the visualizer renders from the
+# HEALPix maps directly at whatever nside the view needs (see healpix_maps.py)
 integrated_h2_map = resample_2d_array(integrated_h2_map)
-h2_emission_cube = resample_3d_array(h2_wavs, np.array(fims_map))
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+Background job manager for the visualizer's long-running callbacks.
+
+Callbacks registered with background=True run in a subprocess started by Dash's DiskcacheManager, so they never
+hold a web worker: the browser gets a job handle back at once and polls for progress and the result. Jobs,
+progress and results live in one diskcache directory (OB_VISUALIZER_JOB_DIR, default <tmp>/ob-visualizer-jobs),
+shared by every gunicorn worker. Results are cached by the callback's inputs, its source and the data version for
+CACHE_EXPIRE seconds.
+
+JobManager adds deduplication on top: a request whose result is already cached, or whose identical job is still
+running (in any worker), is attached to that job instead of starting another process. Jobs are recorded with
+their process start time, so a pid reused by an unrelated process is never reported as running or killed.
+Each job counts the requests attached to it: a request that cancels it, or supersedes it with a newer one, only
+detaches, and the job is killed when the last attached request detaches or once its result is cached.
+
+Jobs are forked from a worker whose other threads use the same SQLite job store. A fork in the middle of one of
+their reads or writes copies SQLite's in-process lock state into the job, which then waits forever for a lock
+nobody holds; JobCache operations and the fork therefore never overlap.
+"""
+
+import contextlib
+import os
+import tempfile
+import threading
+import diskcache
+import psutil
+from dash import DiskcacheManager
+
+JOB_DIR = os.environ.get('OB_VISUALIZER_JOB_DIR', os.path.join(tempfile.gettempdir(), 'ob-visualizer-jobs'))
+CACHE_EXPIRE = 3600    # s a cached result lives after its last use
+
+class JobCache(diskcache.Cache):
+    """diskcache.Cache whose operations hold fork_lock, the lock JobManager forks jobs under."""
+
+    fork_lock = threading.RLock()
+
+    def get(self, *args, **kwargs):
+        with self.fork_lock:
+            return super().get(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        with self.fork_lock:
+            return super().set(*args, **kwargs)
+
+    def add(self, *args, **kwargs):
+        with self.fork_lock:
+            return super().add(*args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        # decr is incr with -delta
+        with self.fork_lock:
+            return super().incr(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with self.fork_lock:
+            return super().delete(*args, **kwargs)
+
+    def touch(self, *args, **kwargs):
+        with self.fork_lock:
+            return super().touch(*args, **kwargs)
+
+    def transact(self, retry=False):
+        # A generator-based context manager: the lock is held from __enter__ to __exit__
+        with self.fork_lock, super().transact(retry):
+            yield
+
+    transact = contextlib.contextmanager(transact)
+
+# The job is single threaded; give it a lock nobody holds
+os.register_at_fork(after_in_child=lambda: setattr(JobCache, 'fork_lock', threading.RLock()))
+
+class JobManager(DiskcacheManager):
+    """DiskcacheManager that starts at most one job per cache key."""
+
+    def call_job_fn(self, key, job_fn, args, context):
+        # Attaching and detaching (terminate_job) are transactions, so a job is never killed just as a request attaches
+        with self.handle.transact():
+            job = self.handle.get(f'{key}-job')
+            if job is not None and self.result_ready(key):
+                return job
+            if job is not None and self.job_running(job):
+                self.handle.incr(f'job-{job}-attached')
+                return job
+
+        # Two identical requests racing past this point both start a job; the results are the same
+        with JobCache.fork_lock:
+            job = super().call_job_fn(key, job_fn, args, context)
+        try:
+            started = psutil.Process(job).create_time()
+        except psutil.NoSuchProcess:
+            started = None
+        self.handle.set(f'job-{job}', (started, key), expire=CACHE_EXPIRE)
+        self.handle.set(f'job-{job}-attached', 1, expire=CACHE_EXPIRE)
+        self.handle.set(f'{key}-job', job, expire=CACHE_EXPIRE)
+        return job
+
+    def _process(self, job):
+        """The process of pid job if it is still the one this manager started under that pid, else None."""
+        started, _ = self.handle.get(f'job-{int(job)}', (None, None))
+        try:
+            process = psutil.Process(int(job))
+            return process if started is not None and process.create_time() == started else None
+        except psutil.NoSuchProcess:
+            return None
+
+    def job_running(self, job):
+        # Like Dash's, but a job exiting between the checks is not an error
+        process = self._process(job)
+        try:
+            return process is not None and process.status() != psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            return False
+
+    def terminate_job(self, job):
+        # Dash calls this when a request detaches from a job: it was cancelled or superseded (oldJob), or its result
+        # was delivered. Other requests may still be waiting on a deduplicated job, so it is only killed when the
+        # last one detaches, or when its result is cached and the job has nothing left to do.
+        # Dash's version also waits up to 1 s for the job to go, inside a job store transaction. A finished job stays
+        # a zombie until the worker that forked it reaps it, so polls landing on any other worker always waited the
+        # full second with every worker's job store access blocked. Killing does not need the wait.
+        if job is None:
+            return
+        with self.handle.transact():
+            process = self._process(job)
+            if process is None:
+                return
+            _, key = self.handle.get(f'job-{int(job)}')
+            if not self.result_ready(key) and self.handle.decr(f'job-{int(job)}-attached') > 0:
+                return
+            try:
+                for proc in process.children(recursive=True) + [process]:
+                    proc.kill()
+            except psutil.NoSuchProcess:
+                pass
+
+def job_manager(data_version='', job_dir=JOB_DIR):
+    """
+    Builds the app's background callback manager.
+
+    Parameters:
+    - data_version (str): Part of every cache key; change it when the maps or catalogue change.
+    - job_dir (str): diskcache directory for jobs, progress and results.
+
+    Returns:
+    - JobManager: Pass as Dash(background_callback_manager=...).
+    """
+    return JobManager(JobCache(job_dir), cache_by=[lambda: data_version], expire=CACHE_EXPIRE)
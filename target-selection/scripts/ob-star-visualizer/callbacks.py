@@ -1,15 +1,74 @@
-from dash import Output, Input, State, ctx, html, no_update
+from dash import Output, Input, State, Patch, ctx, html, no_update
 from astropy.modeling import models, fitting
 import plotly.graph_objs as go
 import numpy as np
 import io
-import os
 import sys
 sys.path.append('..')
 
-from layout import main_layout, alt_layout
-from data import scatter_fig, SPECTRA_DIR, nighttime_frac
-from load_fims_spear_maps import h2_wavs, h2_emission_cube
+from data import (SPECTRA_DIR, catalogue, star_index, sky_index, region_spectra, background_layer, heatmap_window,
+                  parse_bands, map_pixel)
+from load_fims_spear_maps import H2_BANDS, fims_map, h2_wavs, pixel_summary
+from payloads import line_trace, typed_array
+
+# Plotted width in pixels of the IUE spectrum panel (500 px less its margins); spectra are decimated to it
+IUE_PLOT_WIDTH = 480
+# The continuum is a cubic, so a few dozen samples draw it as smoothly as the full grid
+CONTINUUM_POINTS = 64
+
+# ==================================================
+# Figure Helpers
+# ==================================================
+
+def h2_spectrum_figures(spectrum, low=None, high=None):
+    """
+    Figures for the two H2 spectrum panels (1400 Å and 1610 Å windows) of one FIMS/SPEAR spectrum.
+
+    low and high bound the shaded bands; pass them when they are already known (e.g. from pixel_summary).
+    Each panel only carries the spectrum around its own window (one window width either side, for panning).
+    """
+
+    spectrum = np.asarray(spectrum)
+    low = float(np.min(spectrum) if low is None else low)
+    high = float(np.max(spectrum) if high is None else high)
+
+    def panel(x_range, band, color):
+        pad = x_range[1] - x_range[0]
+        near = (h2_wavs >= x_range[0] - pad) & (h2_wavs <= x_range[1] + pad)
+        x0, x1 = band
+        return [line_trace(h2_wavs[near], spectrum[near], mode='lines', line_color='black', line_width=2,
+                           showlegend=False),
+                go.Scatter(x=[x0, x1, x1, x0], y=[low, low, high, high], fill='toself', mode='none',
+                           showlegend=False, fillcolor=color)]
+
+    return \
+        {
+            'data': panel((1393, 1407), (1395, 1405), 'rgba(255, 200, 200, 0.5)'),
+            'layout': {
+                'xaxis': {'range': [1393, 1407], 'title': 'Wavelength (Å)'},
+                'margin': {'l': 35, 'r': 10, 't': 35, 'b': 35},
+            }
+        }, \
+        {
+            'data': panel((1603, 1617), (1605, 1615), 'rgba(200, 200, 255, 0.5)'),
+            'layout': {
+                'xaxis': {'range': [1603, 1617], 'title': 'Wavelength (Å)'},
+                'yaxis': {'showticklabels': False},
+                'margin': {'l': 0, 'r': 10, 't': 35, 'b': 35},
+            }
+        }
+
+def h2_spectrum_title(text, details=None):
+    return html.Div(
+        style={
+            'fontFamily': 'Arial',
+            'fontSize': '18px',
+            'color': '#414141',
+            'padding': '3px',
+            'textAlign': 'center'
+        },
+        children=[text] if details is None else [text, html.Div(details, style={'fontSize': '12px'})]
+    )
 
 # ==================================================
 # Callbacks
@@ -17,38 +76,42 @@ from load_fims_spear_maps import h2_wavs, h2_emission_cube
 
 def register_callbacks(app):
 
-    ### LAYOUT RENDERING
-    @app.callback(
+    ### LAYOUT RENDERING (clientside: both views stay mounted and are only shown/hidden)
+    app.clientside_callback(
+        """
+        function(switch_to_alt, switch_to_main) {
+            const triggered = dash_clientside.callback_context.triggered.map(t => t.prop_id);
+            return triggered.includes("switch-to-alt-btn.n_clicks") ? "alt" : "main";
+        }
+        """,
         Output("layout-store", "data"),
         [Input("switch-to-alt-btn", "n_clicks"),
          Input("switch-to-main-btn", "n_clicks")]
     )
-    def toggle_layout(switch_to_alt, switch_to_main):
-        if ctx.triggered_id == "switch-to-alt-btn":
-            return "alt"
-        return "main"
 
-    @app.callback(
-        Output("dynamic-layout", "children"),
+    app.clientside_callback(
+        """
+        function(layout_store) {
+            const show = {"display": "block"}, hide = {"display": "none"};
+            return layout_store === "alt" ? [hide, show] : [show, hide];
+        }
+        """,
+        [Output("main-container", "style"),
+         Output("alt-container", "style")],
         Input("layout-store", "data"),
         prevent_initial_call=True
     )
-    def render_layout(layout_store):
-        if layout_store == "alt":
-            return alt_layout()
-        return main_layout()
 
     ### UPDATE PANELS
     @app.callback(
         [Output("download-csv", "data"),
          Output("selected-stars", "children"),
          Output("selected-stars-store", "data")],
-        [Input("switch-to-main-btn", "n_clicks"),
-         Input("download-btn", "n_clicks"),
+        [Input("download-btn", "n_clicks"),
          Input("scatter-plot", "selectedData"),
          Input("selected-stars-store", "data")]
     )
-    def selected_stars_textbox(to_main_btn, n_clicks, selectedData, selected_stars_store):
+    def selected_stars_textbox(n_clicks, selectedData, selected_stars_store):
 
         restore = False
         to_store = no_update
@@ -110,168 +173,127 @@ def register_callbacks(app):
          Output("h2-spectra-plot-chan2", "figure"),
          Output("h2-spectra-plot-text", "children"),
          Output("clicked-bg-store", "data")],
-        [Input("switch-to-main-btn", "n_clicks"),
-         Input("scatter-plot", "clickData")],
-         State("clicked-bg-store", "data")
+        Input("scatter-plot", "clickData"),
+        State("clicked-bg-store", "data")
     )
-    def h2_emission_map(to_main_click,
-                        clickData,
+    def h2_emission_map(clickData,
                         clicked_bg_store):
 
+        # A fresh click on the map, or the last one restored when the view is rebuilt
         if ctx.triggered_id == 'scatter-plot' and clickData is not None and 'customdata' not in clickData['points'][0]:
-
-            lats = np.linspace(-90,90,h2_emission_cube.shape[0])
-            lons = np.linspace(0,360,h2_emission_cube.shape[1])
-            lat_idx = np.where(np.abs(lats - clickData['points'][0]['y']) == np.min(np.abs(lats - clickData['points'][0]['y'])))
-            lon_idx = np.where(np.abs(lons - clickData['points'][0]['x']) == np.min(np.abs(lons - clickData['points'][0]['x'])))
-
-            trace = [(
-                go.Scatter(
-                    x=h2_wavs,
-                    y=h2_emission_cube[lat_idx,lon_idx,:].flatten(),
-                    mode='lines',
-                    line_color='black',
-                    line_width=2,
-                    showlegend=False
-                )
-            )]
-
-            # Plot shaded regions
-            shaded_regions = [
-                [go.Scatter(
-                    x=[1395, 1405, 1405, 1395],
-                    y=[np.min(h2_emission_cube[lat_idx,lon_idx,:]), np.min(h2_emission_cube[lat_idx,lon_idx,:]), np.max(h2_emission_cube[lat_idx,lon_idx,:]), np.max(h2_emission_cube[lat_idx,lon_idx,:])],
-                    fill='toself',
-                    mode='none',
-                    showlegend=False,
-                    fillcolor='rgba(255, 200, 200, 0.5)'
-                )],
-                [go.Scatter(
-                    x=[1605, 1615, 1615, 1605],
-                    y=[np.min(h2_emission_cube[lat_idx,lon_idx,:]), np.min(h2_emission_cube[lat_idx,lon_idx,:]), np.max(h2_emission_cube[lat_idx,lon_idx,:]), np.max(h2_emission_cube[lat_idx,lon_idx,:])],
-                    fill='toself',
-                    mode='none',
-                    showlegend=False,
-                    fillcolor='rgba(200, 200, 255, 0.5)'
-                )]
-            ]
-
-            return \
-                {
-                    'data': trace + shaded_regions[0],
-                    'layout': {
-                        'xaxis': {'range': [1393, 1407], 'title': 'Wavelength (Å)'},
-                        # 'yaxis': {'showticklabels': False},
-                        'margin': {'l': 35, 'r': 10, 't': 35, 'b': 35},
-                    }
-                }, \
-                {
-                    'data': trace + shaded_regions[1],
-                    'layout': {
-                        'xaxis': {'range': [1603, 1617], 'title': 'Wavelength (Å)'},
-                        'yaxis': {'showticklabels': False},
-                        'margin': {'l': 0, 'r': 10, 't': 35, 'b': 35},
-                    }
-                }, \
-                html.Div(
-                    style={
-                        'fontFamily': 'Arial',
-                        'fontSize': '18px',
-                        'color': '#414141',
-                        'padding': '3px'
-                    },
-                    children=f"GAL_LAT: {int(100*clickData['points'][0]['y'])/100}° / GAL_LON: {int(100*clickData['points'][0]['x'])/100}°"
-                ), clickData
-
+            point = clickData['points'][0]
+            to_store = clickData
         elif clicked_bg_store is not None and clickData is None:
+            point = clicked_bg_store['points'][0]
+            to_store = clicked_bg_store
+        else:
+            return no_update, no_update, no_update, no_update
 
-            lats = np.linspace(-90,90,h2_emission_cube.shape[0])
-            lons = np.linspace(0,360,h2_emission_cube.shape[1])
-            lat_idx = np.where(np.abs(lats - clicked_bg_store['points'][0]['y']) == np.min(np.abs(lats - clicked_bg_store['points'][0]['y'])))
-            lon_idx = np.where(np.abs(lons - clicked_bg_store['points'][0]['x']) == np.min(np.abs(lons - clicked_bg_store['points'][0]['x'])))
+        # Extrema and band statistics come from the per-pixel summary table; only the spectrum itself is read
+        pixel = map_pixel(point['x'], point['y'])
+        summary = pixel_summary[pixel]
+        chan1, chan2 = h2_spectrum_figures(fims_map[pixel], summary['min'], summary['max'])
+        band_fluxes = " / ".join(f"{low:g}-{high:g} Å: {flux:,}" for (low, high), flux in zip(H2_BANDS, summary['band_flux']))
+        return chan1, chan2, h2_spectrum_title(
+            f"GAL_LAT: {int(100*point['y'])/100}° / GAL_LON: {int(100*point['x'])/100}°",
+            f"{band_fluxes} · peak {summary['peak_wav']:.0f} Å · SNR {summary['snr']:.1f}"
+        ), to_store
+
+    ### STARS NEAR CLICKED H2 PIXEL (served from the spatial index, not a scan of the catalogue)
+    @app.callback(
+        Output("nearby-stars", "children"),
+        [Input("scatter-plot", "clickData"),
+         Input("nearby-radius", "value")]
+    )
+    def nearby_stars(clickData, radius):
 
-            trace = [(
-                go.Scatter(
-                    x=h2_wavs,
-                    y=h2_emission_cube[lat_idx,lon_idx,:].flatten(),
-                    mode='lines',
-                    line_color='black',
-                    line_width=2,
-                    showlegend=False
-                )
-            )]
+        if clickData is None or 'customdata' in clickData['points'][0] or radius is None:
+            return no_update
 
-            # Plot shaded regions
-            shaded_regions = [
-                [go.Scatter(
-                    x=[1395, 1405, 1405, 1395],
-                    y=[np.min(h2_emission_cube[lat_idx,lon_idx,:]), np.min(h2_emission_cube[lat_idx,lon_idx,:]), np.max(h2_emission_cube[lat_idx,lon_idx,:]), np.max(h2_emission_cube[lat_idx,lon_idx,:])],
-                    fill='toself',
-                    mode='none',
-                    showlegend=False,
-                    fillcolor='rgba(255, 200, 200, 0.5)'
-                )],
-                [go.Scatter(
-                    x=[1605, 1615, 1615, 1605],
-                    y=[np.min(h2_emission_cube[lat_idx,lon_idx,:]), np.min(h2_emission_cube[lat_idx,lon_idx,:]), np.max(h2_emission_cube[lat_idx,lon_idx,:]), np.max(h2_emission_cube[lat_idx,lon_idx,:])],
-                    fill='toself',
-                    mode='none',
-                    showlegend=False,
-                    fillcolor='rgba(200, 200, 255, 0.5)'
-                )]
-            ]
+        point = clickData['points'][0]
+        rows, separations = sky_index.cone(point['x'], point['y'], radius)
+        if len(rows) == 0:
+            return f"none (GAL_LAT: {point['y']:.2f}° / GAL_LON: {point['x']:.2f}°)"
+
+        return [html.Span(f"{len(rows)} — ", style={'fontWeight': 'bold'})] + [
+            html.Span(
+                f"{name} ({separation:.1f}°)" + ("*" if star_index.has_spectrum[row] else ""),
+                title="IUE spectrum available" if star_index.has_spectrum[row] else None,
+                style={'margin-right': '12px'}
+            )
+            for row, name, separation in zip(rows, catalogue['name'][rows], separations)
+        ]
 
-            return \
-                {
-                    'data': trace + shaded_regions[0],
-                    'layout': {
-                        'xaxis': {'range': [1393, 1407], 'title': 'Wavelength (Å)'},
-                        # 'yaxis': {'showticklabels': False},
-                        'margin': {'l': 35, 'r': 10, 't': 35, 'b': 35},
-                    }
-                }, \
-                {
-                    'data': trace + shaded_regions[1],
-                    'layout': {
-                        'xaxis': {'range': [1603, 1617], 'title': 'Wavelength (Å)'},
-                        'yaxis': {'showticklabels': False},
-                        'margin': {'l': 0, 'r': 10, 't': 35, 'b': 35},
-                    }
-                }, \
-                html.Div(
-                    style={
-                        'fontFamily': 'Arial',
-                        'fontSize': '18px',
-                        'color': '#414141',
-                        'padding': '3px'
-                    },
-                    children=f"GAL_LAT: {int(100*clicked_bg_store['points'][0]['y'])/100}° / GAL_LON: {int(100*clicked_bg_store['points'][0]['x'])/100}°"
-                ), clicked_bg_store
-            
-        else:
+    ### REGION SPECTRUM (mean / median / sum of every HEALPix pixel in a box selection or named region)
+    # A background job (see background.py): large boxes don't hold a web worker, and results are cached by input.
+    # The trigger decides between the box and the named region, so it is part of the cache key.
+    @app.callback(
+        [Output("h2-spectra-plot-chan1", "figure", allow_duplicate=True),
+         Output("h2-spectra-plot-chan2", "figure", allow_duplicate=True),
+         Output("h2-spectra-plot-text", "children", allow_duplicate=True),
+         Output("region-store", "data")],
+        [Input("scatter-plot", "selectedData"),
+         Input("region-dropdown", "value"),
+         Input("region-statistic", "value")],
+        State("region-store", "data"),
+        background=True,
+        interval=250,
+        progress=Output("region-progress", "children"),
+        progress_default=[""],
+        running=[(Output("region-cancel-btn", "style"), {'display': 'inline-block'}, {'display': 'none'})],
+        cancel=Input("region-cancel-btn", "n_clicks"),
+        cache_ignore_triggered=False,
+        prevent_initial_call=True
+    )
+    def region_spectrum(set_progress, selectedData, region_name, statistic, region_store):
+
+        if ctx.triggered_id == 'scatter-plot':
+            if selectedData is None or 'range' not in selectedData:
+                return no_update, no_update, no_update, no_update
+            (l_min, l_max), (b_min, b_max) = sorted(selectedData['range']['x']), sorted(selectedData['range']['y'])
+            region_store = {'box': [l_min, l_max, b_min, b_max]}
+        elif ctx.triggered_id == 'region-dropdown':
+            if region_name is None:
+                return no_update, no_update, no_update, no_update
+            region_store = {'name': region_name}
+        elif region_store is None:
             return no_update, no_update, no_update, no_update
 
+        set_progress("Selecting pixels…")
+        if 'name' in region_store:
+            pixels = region_spectra.region_pixels[region_store['name']]
+            label = region_store['name']
+        else:
+            l_min, l_max, b_min, b_max = region_store['box']
+            pixels = region_spectra.box_pixels(l_min, l_max, b_min, b_max)
+            label = f"GAL_LON {l_min:.1f}–{l_max:.1f}° / GAL_LAT {b_min:.1f}–{b_max:.1f}°"
+
+        set_progress(f"Taking the {statistic} of {len(pixels)} px…")
+        spectrum = region_spectra.aggregate(pixels, (statistic,))[statistic]
+        if spectrum is None:
+            return no_update, no_update, h2_spectrum_title(f"{label}: no pixels"), region_store
+
+        chan1, chan2 = h2_spectrum_figures(spectrum)
+        return chan1, chan2, h2_spectrum_title(f"{label} ({statistic} of {len(pixels)} px)"), region_store
 
     @app.callback(
         Output("IUE-spectra-plot", "figure"),
-        [Input("switch-to-main-btn", "n_clicks"),
-         Input("scatter-plot", "clickData"),
+        [Input("scatter-plot", "clickData"),
          Input("norm-spectra-checkbox", "value"),
          Input("show-cont-checkbox", "value")],
          State("clicked-star-store", "data")
     )
-    def IUE_spectra_textbox(to_main_click, clickData, norm_spectra_checkbox, show_cont_checkbox, clicked_star_store):
+    def IUE_spectra_textbox(clickData, norm_spectra_checkbox, show_cont_checkbox, clicked_star_store):
         
         restore = False
         if not (ctx.triggered_id == 'scatter-plot' and clickData is not None) and clicked_star_store is not None:
             restore = True
 
-        spectra_list = os.listdir(SPECTRA_DIR)
         if restore:
-            star_name = clicked_star_store['points'][0]['customdata'][0].replace(' ', '_')
+            star_name = clicked_star_store['points'][0]['customdata'][0]
 
         elif clickData and 'customdata' in clickData['points'][0]:
-            star_name = clickData['points'][0]['customdata'][0].replace(' ', '_')
+            star_name = clickData['points'][0]['customdata'][0]
             
         elif clickData and 'customdata' not in clickData['points'][0]:
             return no_update
@@ -287,7 +309,8 @@ def register_callbacks(app):
                 }
             }
         
-        if f"{star_name}.csv" in spectra_list:
+        if star_index.spectrum_available(star_name):
+            star_name = star_name.replace(' ', '_')
 
             spectra = np.genfromtxt(f"{SPECTRA_DIR}{star_name}.csv", delimiter=',', dtype='float')
             if spectra.ndim == 1: spectra = spectra[np.newaxis, :]
@@ -340,39 +363,22 @@ def register_callbacks(app):
                 )
             ]
 
-            # Plot individual spectra
+            # Plot individual spectra, as typed arrays decimated to the panel's width
             traces = [
-                go.Scatter(
-                    x=wav,
-                    y=flux,
-                    mode='lines',
-                    line_color='black',
-                    line_width=2,
-                    showlegend=False
-                ) for wav, flux in zip(wavs, fluxs)
+                line_trace(wav, flux, width=IUE_PLOT_WIDTH, mode='lines', line_color='black', line_width=2,
+                           showlegend=False)
+                for wav, flux in zip(wavs, fluxs)
             ]
 
             if show_cont_checkbox:
                 traces.append(
-                    go.Scatter(
-                        x=avg_wav,
-                        y=avg_flux,
-                        mode='lines',
-                        line_color='red',
-                        line_width=2,
-                        showlegend=False
-                    )
+                    line_trace(avg_wav, avg_flux, width=IUE_PLOT_WIDTH, mode='lines', line_color='red',
+                               line_width=2, showlegend=False)
                 )
+                cont_wav = np.linspace(avg_wav[0], avg_wav[-1], CONTINUUM_POINTS)
                 traces.append(
-                    go.Scatter(
-                        x=avg_wav,
-                        y=cont_flux,
-                        mode='lines',
-                        line_color='blue',
-                        line_dash='longdash',
-                        line_width=2,
-                        showlegend=False
-                    )
+                    line_trace(cont_wav, cont_model(cont_wav), mode='lines', line_color='blue',
+                               line_dash='longdash', line_width=2, showlegend=False)
                 )
 
             return \
@@ -401,12 +407,10 @@ def register_callbacks(app):
         [Output("nighttime-frac-plot", "figure"),
          Output("clicked-star", "children"),
          Output("clicked-star-store", "data")],
-        [Input("switch-to-main-btn", "n_clicks"),
-         Input("scatter-plot", "clickData")],
-         State("clicked-star-store", "data")
+        Input("scatter-plot", "clickData"),
+        State("clicked-star-store", "data")
     )
-    def star_info(to_main_click,
-                  clickData,
+    def star_info(clickData,
                   clicked_star_store):
 
         restore = False
@@ -433,7 +437,7 @@ def register_callbacks(app):
 
         elif restore:
 
-            y = nighttime_frac[np.where(nighttime_frac[:,0] == clicked_star_store['points'][0]['customdata'][0])[0][0],1:]
+            y = star_index[clicked_star_store['points'][0]['customdata'][0]]['night_frac']
 
             star_data = [
                 clicked_star_store['points'][0]['customdata'][1],
@@ -444,7 +448,7 @@ def register_callbacks(app):
 
         else:
 
-            y = nighttime_frac[np.where(nighttime_frac[:,0] == clickData['points'][0]['customdata'][0])[0][0],1:]
+            y = star_index[clickData['points'][0]['customdata'][0]]['night_frac']
 
             star_data = [
                 clickData['points'][0]['customdata'][1],
@@ -472,76 +476,94 @@ def register_callbacks(app):
                 html.P(f"GAL_LON:   {star_data[3]:.4f}", style={"margin": "0"})
             ]), to_store
     
-    ### RESTORING STATES
-    @app.callback(
-        [Output("show-spectra-checkbox-store", "data"),
-         Output("show-bg-checkbox-store", "data"),
-         Output("norm-spectra-checkbox-store", "data"),
-         Output("show-cont-checkbox-store", "data"),
-         Output("show-spectra-checkbox", "value"),
-         Output("show-bg-checkbox", "value"),
-         Output("norm-spectra-checkbox", "value"),
-         Output("show-cont-checkbox", "value"),
-         Output("scatter-store", "data"),
-         Output("scatter-plot", "figure")],
-        [Input("switch-to-alt-btn", "n_clicks"),
-         Input("switch-to-main-btn", "n_clicks"),
-         Input("show-spectra-checkbox", "value"),
+    ### CHECKBOX TOGGLES (clientside: the figure already holds every trace, only visibility changes)
+    app.clientside_callback(
+        """
+        function(show_spectra_checkbox, show_bg_checkbox, figure) {
+            if (!figure) {
+                return dash_clientside.no_update;
+            }
+            const show_spectra = Boolean(show_spectra_checkbox && show_spectra_checkbox.length);
+            const show_bg = Boolean(show_bg_checkbox && show_bg_checkbox.length);
+            const visible = {"h2-background": show_bg, "all-stars": !show_spectra, "spectra-stars": show_spectra};
+            const data = figure.data.map(trace =>
+                trace.meta in visible ? Object.assign({}, trace, {visible: visible[trace.meta]}) : trace
+            );
+            return Object.assign({}, figure, {data: data});
+        }
+        """,
+        Output("scatter-plot", "figure"),
+        [Input("show-spectra-checkbox", "value"),
          Input("show-bg-checkbox", "value")],
-        [State("norm-spectra-checkbox", "value"),
-         State("show-cont-checkbox", "value"),
-         State("show-spectra-checkbox-store", "data"),
-         State("show-bg-checkbox-store", "data"),
-         State("norm-spectra-checkbox-store", "data"),
-         State("show-cont-checkbox-store", "data"),
-         State("scatter-plot", "figure"),
-         State("scatter-store", "data")],
+        State("scatter-plot", "figure"),
         prevent_initial_call=True
     )
-    def restore_checkboxes_and_scatter(to_alt_click,
-                                       to_main_click,
-                                       show_spectra_checkbox,
-                                       show_bg_checkbox,
-                                       norm_spectra_checkbox,
-                                       show_cont_checkbox,
-                                       show_spectra_store,
-                                       show_bg_store,
-                                       norm_spectra_store,
-                                       show_cont_store,
-                                       current_figure,
-                                       stored_figure):
-
-        # the order of these chunks doesn't seem logical but it is SUPER finicky. alter with caution
-
-        # Store figure if limits are updated to something meaningful
-        fig_to_store = no_update
-        if current_figure is not None:
-            if current_figure["layout"]["xaxis"]["range"] != [0,360]:
-                fig_to_store = current_figure
-                stored_figure = current_figure
-
-        # Use current show_spectra and show_bg checkbox values if updated
-        show_spectra = show_spectra_store
-        show_bg = show_bg_store
-        if show_spectra_checkbox or show_bg_checkbox:
-            show_spectra = show_spectra_checkbox
-            show_bg = show_bg_checkbox
-
-        ##############
-
-        # Store all values when switching to alt layout
-        if ctx.triggered_id == 'switch-to-alt-btn' and to_alt_click:
-            return show_spectra_checkbox, show_bg_checkbox, norm_spectra_checkbox, show_cont_checkbox, \
-                no_update, no_update, no_update, no_update, \
-                fig_to_store, no_update
-
-        # Use stored figure limits if they exist
-        fig_to_display = scatter_fig(show_spectra, show_bg)
-        if stored_figure is not None:
-            fig_to_display = scatter_fig(show_spectra, show_bg, stored_figure["layout"]["xaxis"]["range"], stored_figure["layout"]["yaxis"]["range"])
-
-        # Handle all other cases
-        return no_update, no_update, no_update, no_update, \
-            show_spectra, show_bg, \
-            norm_spectra_store, show_cont_store, \
-            fig_to_store, fig_to_display
\ No newline at end of file
+
+    ### H2 BACKGROUND RESOLUTION
+    app.clientside_callback(
+        """
+        function(relayout, view_range) {
+            if (!relayout) {
+                return dash_clientside.no_update;
+            }
+            const defaults = {"x": [0, 360], "y": [-90, 90]};
+            const range = Object.assign({}, defaults, view_range);
+            let changed = false;
+            for (const axis of ["x", "y"]) {
+                const full = relayout[axis + "axis.range"];
+                const lo = relayout[axis + "axis.range[0]"], hi = relayout[axis + "axis.range[1]"];
+                if (full) {
+                    range[axis] = full;
+                } else if (lo !== undefined && hi !== undefined) {
+                    range[axis] = [lo, hi];
+                } else if (relayout[axis + "axis.autorange"]) {
+                    range[axis] = defaults[axis];
+                } else {
+                    continue;
+                }
+                changed = true;
+            }
+            return changed ? range : dash_clientside.no_update;
+        }
+        """,
+        Output("view-range-store", "data"),
+        Input("scatter-plot", "relayoutData"),
+        State("view-range-store", "data"),
+        prevent_initial_call=True
+    )
+
+    @app.callback(
+        [Output("scatter-plot", "figure", allow_duplicate=True),
+         Output("h2-bands-input", "style")],
+        [Input("view-range-store", "data"),
+         Input("show-bg-checkbox", "value"),
+         Input("bg-layer-dropdown", "value"),
+         Input("h2-bands-input", "value")],
+        State("h2-bands-input", "style"),
+        prevent_initial_call=True
+    )
+    def h2_background_window(view_range, show_bg_checkbox, bg_layer, bands_text, bands_style):
+
+        # Band text that doesn't parse is flagged and the map is left as it is
+        try:
+            bands = parse_bands(bands_text)
+        except ValueError:
+            return no_update, dict(bands_style, borderColor='red')
+        bands_style = dict(bands_style, borderColor='')
+
+        # Only the heatmap trace (always first) is patched, sampled at the resolution that fits the view
+        if show_bg_checkbox != [True]:
+            return no_update, bands_style
+        if view_range is None:
+            window = heatmap_window(layer=bg_layer, bands=bands)
+        else:
+            window = heatmap_window(view_range["x"], view_range["y"], layer=bg_layer, bands=bands)
+        settings = background_layer(bg_layer, bands)
+
+        patched_fig = Patch()
+        for key, value in window.items():
+            patched_fig["data"][0][key] = typed_array(value)
+        patched_fig["data"][0]["zmin"] = settings["zmin"]
+        patched_fig["data"][0]["zmax"] = settings["zmax"]
+        patched_fig["data"][0]["colorbar"]["title"]["text"] = settings["title"]
+        return patched_fig, bands_style
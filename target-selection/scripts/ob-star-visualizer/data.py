@@ -1,130 +1,268 @@
+import functools
 import os
+import re
 import sys
 sys.path.append('..')
+import healpy as hp
 import numpy as np
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objs as go
 
-from load_fims_spear_maps import integrated_h2_map
+from catalogue import CatalogueIndex, load_catalogue, hover_text
+from fit_h2_maps import load_fit_maps
+from healpix_maps import MultiResolutionMap
+from load_fims_spear_maps import FIMS_MAP_FILE, H2_BANDS, fims_map, h2_wavs, integrate_bands
+from payloads import typed_array
+from region_spectra import RegionSpectra
+from sky_index import SkyIndex
 
 # ==================================================
 # Constants and Data Loading
 # ==================================================
 
-STAR_DATA_FILE = "../../ob_catalogue/ob_catalogue.csv"
 SPECTRA_DIR = "../../ob_catalogue/ob_catalogue_spectra/"
 
-# Load star data (Main_ID, m_V, GAL_LON, GAL_LAT, SP_TYPE)
-raw_stars = np.genfromtxt(STAR_DATA_FILE, delimiter=',', dtype='str')
-spectra_files = os.listdir(SPECTRA_DIR)
-spectra_star_names = [file.split('.')[0].replace('_', ' ') for file in spectra_files]
+# Typed star catalogue (see ../catalogue.py); read from its columnar npz cache
+catalogue = load_catalogue()
+star_index = CatalogueIndex(catalogue, SPECTRA_DIR)
+sky_index = SkyIndex(catalogue['l'], catalogue['b'])
+
+# Pixel lookups for box, cone and named-region spectra straight from the HEALPix map (see ../region_spectra.py)
+region_spectra = RegionSpectra(fims_map)
+
+# Part of the cache key of background callback results (see background.py); they derive from the FIMS/SPEAR map
+DATA_VERSION = f"{os.path.getmtime(FIMS_MAP_FILE):.0f}"
 
 # ==================================================
 # Data Preparation
 # ==================================================
 
 # Assign colors based on spectral type
-color_labels = ["O-type" if s.startswith("O") else "B-type" if s.startswith("B") else "Other"
-                for s in raw_stars[:, 4]]
+color_labels = np.where(np.char.startswith(catalogue['sp_type'], 'O'), 'O-type',
+                        np.where(np.char.startswith(catalogue['sp_type'], 'B'), 'B-type', 'Other'))
 color_map = {"O-type": "blue", "B-type": "red", "Other": "gray"}
 
 # Assign sizes in a decreasing sequence as an exponential
-pt1 = [np.min(raw_stars[:,1].astype('float')), 100]
-pt2 = [np.max(raw_stars[:,1].astype('float')), 1]
+pt1 = [np.min(catalogue['m_V']), 100]
+pt2 = [np.max(catalogue['m_V']), 1]
 tau = (pt2[0]-pt1[0]) / np.log(pt1[1]/pt2[1])
 A = pt1[1] * np.exp(pt1[0] / tau)
-sizes = A * np.exp(-raw_stars[:,1].astype('float') / tau)
+sizes = A * np.exp(-catalogue['m_V'] / tau)
 
 # Create a DataFrame for plotting
 plot_data = pd.DataFrame({
-    "Name": raw_stars[:, 0],
-    "Apparent Magnitude": raw_stars[:, 1].astype(float),
-    "Galactic Longitude": raw_stars[:, 2].astype(float),
-    "Galactic Latitude": raw_stars[:, 3].astype(float),
-    "Spectral Type": raw_stars[:, 4],
+    "Name": catalogue['name'],
+    "Apparent Magnitude": catalogue['m_V'],
+    "Galactic Longitude": catalogue['l'],
+    "Galactic Latitude": catalogue['b'],
+    "Spectral Type": catalogue['sp_type'],
     "Color": color_labels,
-    "Size": sizes
+    "Size": sizes,
+    "Hover Text": hover_text(catalogue)
 })
-nighttime_frac = np.column_stack((raw_stars[:,0],raw_stars[:,8:]))
-
-# Custom hover text
-plot_data["Hover Text"] = plot_data.apply(
-    lambda row: (
-        f"Main_ID: {row['Name']}<br>SP_TYPE: {row['Spectral Type']}<br>m_V: {row['Apparent Magnitude']}"
-        f"<br>GAL_LAT: {row['Galactic Latitude']:.4f}<br>GAL_LON: {row['Galactic Longitude']:.4f}"
-    ), axis=1
-)
+
+# Best-fit H2 temperature and amplitude per HEALPix pixel (see ../fit_h2_maps.py)
+h2_fit = load_fit_maps(fims_map, h2_wavs, FIMS_MAP_FILE)
+FIMS_NSIDE = hp.npix2nside(len(fims_map))
+
+def map_pixel(l, b):
+    """RING pixel of the FIMS/SPEAR map at (l, b)."""
+    return hp.ang2pix(FIMS_NSIDE, l, b, nest=False, lonlat=True)
+
+# Maps the heatmap can show; the first is the default. Each is kept as HEALPix at every
+# nside down to healpix_maps.MIN_NSIDE (see ../healpix_maps.py), and the figure only ever
+# carries the view sampled from the coarsest nside that still resolves its cells.
+BACKGROUND_LAYERS = {
+    'h2': dict(
+        label='BP Integrated',
+        map=MultiResolutionMap(integrate_bands(H2_BANDS)),
+        zmin=0,
+        zmax=5e5,
+        title="H2 Integrated Emission (erg / s / cm^2 / arcsec^2)"
+    ),
+    'temperature': dict(
+        label='Fit Temperature',
+        map=MultiResolutionMap(h2_fit['temperature']),
+        zmin=h2_fit['temperatures'][0],
+        zmax=h2_fit['temperatures'][-1],
+        title="Best-fit H2 Temperature (K)"
+    ),
+    'amplitude': dict(
+        label='Fit Amplitude',
+        map=MultiResolutionMap(h2_fit['amplitude']),
+        zmin=0,
+        zmax=float(np.nanpercentile(h2_fit['amplitude'], 99)),
+        title="Best-fit H2 Line Flux (erg / s / cm^2 / arcsec^2)"
+    ),
+}
+
+# Heatmap cells are 1° at full zoom (about the native 0.92° pixels) and double in size
+# until the view fits in MAX_HEATMAP_CELLS
+MAX_HEATMAP_CELLS = 20000
+MIN_CELL_SIZE = 1.0
+
+def format_bands(bands):
+    return ", ".join(f"{low:g}-{high:g}" for low, high in bands)
+
+def parse_bands(text):
+    """
+    Parses band selector text such as "1395-1405, 1605-1615" into ((1395.0, 1405.0), (1605.0, 1615.0)).
+
+    Raises:
+    - ValueError: If the text is not a comma separated list of low-high pairs with low < high.
+    """
+    bands = []
+    for item in filter(None, (part.strip() for part in (text or "").split(","))):
+        match = re.fullmatch(r"(\d+(?:\.\d*)?)\s*-\s*(\d+(?:\.\d*)?)", item)
+        if match is None or float(match.group(1)) >= float(match.group(2)):
+            raise ValueError(f"invalid band {item!r}; expected low-high in Å")
+        bands.append((float(match.group(1)), float(match.group(2))))
+    if not bands:
+        raise ValueError("no bands given")
+    return tuple(bands)
+
+@functools.lru_cache(maxsize=16)
+def band_layer(bands):
+    """
+    Background layer for the FIMS/SPEAR map integrated over arbitrary bands, built from the prefix sums.
+
+    The default H2 bands return the prebuilt 'h2' layer; other band sets are integrated and given their
+    resolution levels on first use and kept for the next pans and zooms.
+    """
+    if bands == H2_BANDS:
+        return BACKGROUND_LAYERS['h2']
+    z = integrate_bands(bands)
+    return dict(
+        label='BP Integrated',
+        map=MultiResolutionMap(z),
+        zmin=0,
+        zmax=max(float(np.percentile(z, 99)), 1.0),
+        title=f"H2 Integrated Emission, {format_bands(bands)} Å (erg / s / cm^2 / arcsec^2)"
+    )
+
+def background_layer(layer='h2', bands=None):
+    """Settings and multi-resolution map of a background layer; bands only applies to the integrated 'h2' layer."""
+    if layer == 'h2' and bands is not None:
+        return band_layer(tuple(bands))
+    return BACKGROUND_LAYERS[layer]
+
+def heatmap_window(xlims=[0,360], ylims=[-90,90], max_cells=MAX_HEATMAP_CELLS, layer='h2', bands=None):
+    """
+    Returns x, y and z of a background layer over the view, in at most max_cells cells.
+
+    Cells are MIN_CELL_SIZE * 2^k degrees on a fixed sky-aligned grid, so panning does not shift them, and are
+    filled from the coarsest HEALPix level that resolves them. The view is padded by one cell on every side so
+    panning doesn't show an edge.
+    """
+    x0, x1 = max(min(xlims), 0), min(max(xlims), 360)
+    y0, y1 = max(min(ylims), -90), min(max(ylims), 90)
+    cell = MIN_CELL_SIZE
+    while (np.ceil(x1 / cell) - np.floor(x0 / cell) + 2) * (np.ceil(y1 / cell) - np.floor(y0 / cell) + 2) > max_cells \
+            and cell < 180:
+        cell *= 2
+
+    # Cell centres, clipped to the sky
+    lons = (np.arange(np.floor(x0 / cell) - 1, np.ceil(x1 / cell) + 1) + 0.5) * cell
+    lats = (np.arange(np.floor(y0 / cell) - 1, np.ceil(y1 / cell) + 1) + 0.5) * cell
+    lons = lons[(lons > 0) & (lons < 360)]
+    lats = lats[(lats > -90) & (lats < 90)]
+    z = background_layer(layer, bands)['map'].grid(lons, lats, resolution=cell)
+    return {'x': lons, 'y': lats, 'z': np.asarray(z, dtype=float)}
 
 # ==================================================
 # Figure Creation
 # ==================================================
 
-def scatter_fig(show_spectra=[], show_bg=[], xlims=[0,360], ylims=[-90,90]):
+# Above this many stars the markers are drawn with WebGL (Scattergl) instead of
+# SVG; SVG hover and box-select slow down badly beyond a few thousand points
+WEBGL_THRESHOLD = 5000
+
+# Marker area scaling, as px.scatter does it: the largest star is 20 px across
+SIZEREF = 2. * plot_data['Size'].max() / 20**2
+
+STAR_HOVERTEMPLATE = (
+    "Main_ID: %{customdata[0]}<br>"
+    "SP_TYPE: %{customdata[1]}<br>"
+    "m_V: %{customdata[2]:.2f}<br>"
+    "GAL_LAT: %{y:.4f}<br>"
+    "GAL_LON: %{x:.4f}<extra></extra>"
+)
+
+def star_traces(stars, meta, render_mode='auto'):
+    """
+    One marker trace per spectral-type colour, with size, colour and customdata as arrays.
+
+    Parameters:
+    - stars (DataFrame): Rows of plot_data to draw.
+    - meta (str): Tag stored on every trace (see _build_scatter_fig).
+    - render_mode (str): 'svg', 'webgl', or 'auto' to use WebGL above WEBGL_THRESHOLD stars.
+
+    Returns:
+    - list: go.Scatter or go.Scattergl traces.
+    """
+    # 'auto' looks at the whole catalogue, not this subset, so every layer uses the same trace type
+    if render_mode == 'auto':
+        render_mode = 'webgl' if len(plot_data) > WEBGL_THRESHOLD else 'svg'
+    Trace = go.Scattergl if render_mode == 'webgl' else go.Scatter
+
+    traces = []
+    for label, color in color_map.items():
+        group = stars[stars['Color'] == label]
+        if group.empty:
+            continue
+        traces.append(Trace(
+            x=group['Galactic Longitude'].to_numpy(),
+            y=group['Galactic Latitude'].to_numpy(),
+            mode='markers',
+            name=label,
+            legendgroup=label,
+            marker=dict(color=color, size=group['Size'].to_numpy(), sizemode='area',
+                        sizeref=SIZEREF, line=dict(width=0)),
+            customdata=np.column_stack((group['Name'], group['Spectral Type'], group['Apparent Magnitude'])),
+            hovertemplate=STAR_HOVERTEMPLATE,
+            meta=meta
+        ))
+    return traces
+
+def _build_scatter_fig(render_mode='auto'):
+    """
+    Build the figure once, with every trace the checkboxes can switch between.
+
+    render_mode is passed to star_traces.
+
+    Traces are tagged through `meta` so the browser can toggle them without a
+    server round trip: 'h2-background' is the heatmap, 'all-stars' the full
+    catalogue and 'spectra-stars' only the stars with IUE spectra.
+    """
     
     fig = go.Figure()
 
-    if show_bg == [True]:
-        lons = np.linspace(0, 360, integrated_h2_map.shape[1])
-        lats = np.linspace(-90, 90, integrated_h2_map.shape[0])
-        fig.add_trace(go.Heatmap(
-            x=lons,
-            y=lats,
-            z=integrated_h2_map,
-            zmin=0,
-            zmax=5e5,
-            colorscale='Viridis',
-            colorbar=dict(
-                orientation='h',
-                x=0.59,
-                xanchor='center',
-                y=-0.15,
-                ticklabelposition='outside bottom',
-                title=dict(
-                    text=r"H2 Integrated Emission (erg / s / cm^2 / arcsec^2)",
-                    side="bottom"
-                ),
-                len=0.5,
-                thickness=15
+    fig.add_trace(go.Heatmap(
+        **heatmap_window(),
+        zmin=BACKGROUND_LAYERS['h2']['zmin'],
+        zmax=BACKGROUND_LAYERS['h2']['zmax'],
+        colorscale='Viridis',
+        colorbar=dict(
+            orientation='h',
+            x=0.59,
+            xanchor='center',
+            y=-0.15,
+            ticklabelposition='outside bottom',
+            title=dict(
+                text=BACKGROUND_LAYERS['h2']['title'],
+                side="bottom"
             ),
-            hovertemplate='GAL_LAT: %{y}<br>GAL_LON: %{x}<br>Value: %{z}<extra></extra>'
-        ))
-
-    if show_spectra == [True]:
-        scatter_fig = px.scatter(
-            plot_data[plot_data['Name'].isin(spectra_star_names)],
-            x="Galactic Longitude",
-            y="Galactic Latitude",
-            color="Color",
-            size="Size",
-            custom_data=["Name", "Spectral Type", "Apparent Magnitude"],
-            color_discrete_map=color_map
-        )
-    else:
-        scatter_fig = px.scatter(
-            plot_data,
-            x="Galactic Longitude",
-            y="Galactic Latitude",
-            color="Color",
-            size="Size",
-            custom_data=["Name", "Spectral Type", "Apparent Magnitude"],
-            color_discrete_map=color_map
-        )
-
-    for trace in scatter_fig.data:
-        fig.add_trace(trace)
-
-    fig.update_traces(
-        marker=dict(line=dict(width=0)),
-        hovertemplate=(
-            "Main_ID: %{customdata[0]}<br>"
-            "SP_TYPE: %{customdata[1]}<br>"
-            "m_V: %{customdata[2]:.2f}<br>"
-            "GAL_LAT: %{y:.4f}<br>"
-            "GAL_LON: %{x:.4f}<extra></extra>"
+            len=0.5,
+            thickness=15
         ),
-        selector=dict(type='scatter')
-    )
+        hovertemplate='GAL_LAT: %{y}<br>GAL_LON: %{x}<br>Value: %{z}<extra></extra>',
+        meta='h2-background'
+    ))
+
+    for meta, stars in [('all-stars', plot_data),
+                        ('spectra-stars', plot_data[star_index.has_spectrum])]:
+        for trace in star_traces(stars, meta, render_mode):
+            fig.add_trace(trace)
 
     # Plot lat/lon grid
     for lat_line in range(-90, 91, 30):
@@ -153,12 +291,38 @@ def scatter_fig(show_spectra=[], show_bg=[], xlims=[0,360], ylims=[-90,90]):
         autosize=False,
         width=1175,
         height=650,
+        uirevision='scatter-plot',
     )
 
-    fig.update_xaxes(title="Galactic Longitude (°)", range=xlims, ticklabelposition="outside top", side="top", showgrid=False)
-    fig.update_yaxes(title="Galactic Latitude (°)", range=ylims, showgrid=False)
+    fig.update_xaxes(title="Galactic Longitude (°)", range=[0, 360], ticklabelposition="outside top", side="top", showgrid=False)
+    fig.update_yaxes(title="Galactic Latitude (°)", range=[-90, 90], showgrid=False)
+
+    return fig.to_dict()
+
+def _set_visibility(traces, show_spectra, show_bg):
+    visible = {'h2-background': show_bg, 'all-stars': not show_spectra, 'spectra-stars': show_spectra}
+    return [dict(trace, visible=visible[trace['meta']]) for trace in traces]
+
+# Build all four background/spectra-filter variants once; they differ only in trace visibility
+_base_fig = _build_scatter_fig()
+FIGURE_CACHE = {(spectra, bg): dict(_base_fig, data=_set_visibility(_base_fig['data'], spectra, bg))
+                for spectra in (False, True) for bg in (False, True)}
+
+def scatter_fig(show_spectra=[], show_bg=[], xlims=[0,360], ylims=[-90,90]):
+    """
+    Returns the cached figure variant with the requested axis ranges.
 
-    return fig
+    Only the top-level, layout and axis dicts and the heatmap window are
+    replaced; the other traces are shared with the cache and must not be
+    modified by callers.
+    """
+    base = FIGURE_CACHE[(show_spectra == [True], show_bg == [True])]
+    layout = dict(base['layout'],
+                  xaxis=dict(base['layout']['xaxis'], range=list(xlims)),
+                  yaxis=dict(base['layout']['yaxis'], range=list(ylims)))
+    window = {key: typed_array(value) for key, value in heatmap_window(xlims, ylims).items()}
+    data = [dict(trace, **window) if trace['meta'] == 'h2-background' else trace for trace in base['data']]
+    return {'data': data, 'layout': layout}
 
 # Create the initial figure
 main_fig = scatter_fig()
\ No newline at end of file
@@ -0,0 +1,22 @@
+# gunicorn settings for the OB star visualizer: gunicorn -c gunicorn.conf.py wsgi:server
+#
+# preload_app imports wsgi.py (and with it data.py: catalogue, FIMS/SPEAR map, fit maps,
+# spatial indexes) once in the master before forking, so the workers share those arrays
+# copy-on-write instead of each loading its own copy.
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8050)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 4))
+threads = int(os.environ.get("GUNICORN_THREADS", 2))
+preload_app = True
+timeout = 120
+# Longer than the proxy's idle timeout: with gunicorn's 2 s default, connections the
+# client is about to reuse get closed under it (loadtest.py saw resets on ~1% of requests)
+keepalive = 75
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the garbage collector's reach, so collections
+    # in the workers don't write to (and un-share) the pages holding the preloaded data
+    gc.freeze()
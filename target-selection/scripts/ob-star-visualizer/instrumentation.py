@@ -0,0 +1,187 @@
+"""
+Callback instrumentation for the visualizer.
+
+Every POST to Dash's /_dash-update-component runs exactly one server-side callback, so timing the request and
+measuring its response covers every registered callback without touching their code. Per callback this records
+wall time and response size in fixed-bucket histograms, served as Prometheus text from /metrics (localhost only),
+and writes one JSON line per invocation to the 'ob_visualizer.callbacks' logger.
+
+Setting OB_VISUALIZER_PROFILE_MS turns on a sampling profiler: a background thread samples the stack of the thread
+running the callback every PROFILE_INTERVAL seconds, and invocations slower than the threshold are written as
+collapsed stacks (one 'frame;frame;frame count' line per stack, the flamegraph.pl / speedscope input format) to
+OB_VISUALIZER_PROFILE_DIR.
+
+Under gunicorn every worker keeps its own metrics.
+"""
+
+import bisect
+import collections
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from flask import Response, g, request
+
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+SIZE_BUCKETS_BYTES = (1e3, 3e3, 1e4, 3e4, 1e5, 3e5, 1e6, 3e6, 1e7)
+PROFILE_INTERVAL = 0.005    # s between stack samples
+
+logger = logging.getLogger('ob_visualizer.callbacks')
+if not logger.handlers:
+    # One bare JSON object per line on stderr, whatever the root logging setup is
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style (le = upper bound, the last bucket is +Inf)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum:g}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class CallbackMetrics:
+    """Latency and response-size histograms per (callback, trigger), plus error counts; thread safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = collections.defaultdict(lambda: Histogram(LATENCY_BUCKETS_MS))
+        self.size = collections.defaultdict(lambda: Histogram(SIZE_BUCKETS_BYTES))
+        self.errors = collections.Counter()
+
+    def observe(self, callback, trigger, ms, size, status):
+        with self._lock:
+            self.latency[callback, trigger].observe(ms)
+            self.size[callback, trigger].observe(size)
+            if status >= 400:
+                self.errors[callback] += 1
+
+    def prometheus(self):
+        with self._lock:
+            lines = ['# TYPE dash_callback_duration_ms histogram']
+            for (callback, trigger), hist in sorted(self.latency.items()):
+                lines += hist.lines('dash_callback_duration_ms', f'callback="{callback}",trigger="{trigger}"')
+            lines.append('# TYPE dash_callback_response_bytes histogram')
+            for (callback, trigger), hist in sorted(self.size.items()):
+                lines += hist.lines('dash_callback_response_bytes', f'callback="{callback}",trigger="{trigger}"')
+            lines.append('# TYPE dash_callback_errors_total counter')
+            lines += [f'dash_callback_errors_total{{callback="{callback}"}} {count}'
+                      for callback, count in sorted(self.errors.items())]
+        return '\n'.join(lines) + '\n'
+
+
+class StackSampler(threading.Thread):
+    """Samples the stack of one thread until stopped; samples counts collapsed stacks."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = collections.Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+
+def instrument(app, profile_ms=None, profile_dir=None):
+    """
+    Adds callback metrics, JSON logs and /metrics to a Dash app, and the sampling profiler when profile_ms is set.
+
+    Parameters:
+    - app (Dash): App whose callbacks are already registered.
+    - profile_ms (float): Profile invocations slower than this (default: $OB_VISUALIZER_PROFILE_MS; unset = off).
+    - profile_dir (str): Where slow-invocation profiles go (default: $OB_VISUALIZER_PROFILE_DIR or ./profiles).
+
+    Returns:
+    - CallbackMetrics: The app's metrics.
+    """
+    if profile_ms is None and os.environ.get('OB_VISUALIZER_PROFILE_MS'):
+        profile_ms = float(os.environ['OB_VISUALIZER_PROFILE_MS'])
+    profile_dir = profile_dir or os.environ.get('OB_VISUALIZER_PROFILE_DIR', 'profiles')
+
+    metrics = CallbackMetrics()
+    names = {output: getattr(entry.get('callback'), '__name__', output) for output, entry in app.callback_map.items()}
+    server = app.server
+    update_path = app.config.requests_pathname_prefix + '_dash-update-component'
+
+    @server.before_request
+    def _start_timer():
+        if request.path != update_path:
+            return
+        g.callback_start = time.perf_counter()
+        if profile_ms is not None:
+            g.callback_sampler = StackSampler(threading.get_ident())
+            g.callback_sampler.start()
+
+    @server.after_request
+    def _record(response):
+        if request.path != update_path or 'callback_start' not in g:
+            return response
+        ms = (time.perf_counter() - g.callback_start) * 1000
+        body = request.get_json(silent=True) or {}
+        output = body.get('output', '')
+        callback = names.get(output, output)
+        # Background callbacks (see background.py) are polled with their job handle until the result is ready
+        if request.args.get('cacheKey'):
+            trigger = 'poll'
+        else:
+            trigger = ','.join(body.get('changedPropIds') or []) or 'initial'
+        size = response.calculate_content_length() or 0
+
+        metrics.observe(callback, trigger, ms, size, response.status_code)
+        logger.info(json.dumps({'event': 'callback', 'callback': callback, 'trigger': trigger, 'ms': round(ms, 2),
+                                'bytes': size, 'status': response.status_code, 'pid': os.getpid()}))
+
+        sampler = g.pop('callback_sampler', None)
+        if sampler is not None:
+            samples = sampler.stop()
+            if ms >= profile_ms and samples:
+                os.makedirs(profile_dir, exist_ok=True)
+                path = os.path.join(profile_dir, f'{time.strftime("%Y%m%dT%H%M%S")}_{os.getpid()}_{callback}.collapsed')
+                with open(path, 'w') as f:
+                    f.writelines(f'{stack} {count}\n' for stack, count in samples.most_common())
+                logger.warning(json.dumps({'event': 'slow_callback', 'callback': callback, 'ms': round(ms, 2),
+                                           'profile': path}))
+        return response
+
+    @server.route('/metrics')
+    def _metrics():
+        # Local scraping only; the deployed app should not publish its internals
+        if request.remote_addr not in ('127.0.0.1', '::1'):
+            return Response('forbidden\n', status=403, mimetype='text/plain')
+        return Response(metrics.prometheus(), mimetype='text/plain; version=0.0.4')
+
+    return metrics
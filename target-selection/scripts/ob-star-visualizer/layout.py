@@ -1,25 +1,15 @@
-from dash import Dash, html, dcc
-import argparse
+from dash import html, dcc
 
-from data import main_fig
-# from main import args
-
-app = Dash(__name__)
+from data import main_fig, BACKGROUND_LAYERS, H2_BANDS, format_bands
+from region_spectra import REGIONS, STATISTICS
 
 # ==================================================
 # Layout
 # ==================================================
 
-parser = argparse.ArgumentParser(description="Process the --local flag.")
-parser.add_argument(
-    '--local',
-    action='store_true',
-    default=False,
-    help='Enable local mode (default: False)'
-)
-args = parser.parse_args()
+# local=True adds the buttons that switch to the (development-only) spectral fitting view
 
-def main_layout():
+def main_layout(local=False):
         
     children = [
 
@@ -30,6 +20,30 @@ def main_layout():
             config={'scrollZoom': True, 'displayModeBar': True}
         ),
 
+        ### H2 BAND SELECTOR (integrates the FIMS/SPEAR map over any bands for the BP Integrated layer)
+        html.Div(
+            [
+                html.Label(
+                    "H2 Bands (Å):",
+                    style={'fontFamily': 'Arial', 'fontSize': '20px', 'color': '#414141', 'margin-right': '10px'}
+                ),
+                dcc.Input(
+                    id='h2-bands-input',
+                    type='text',
+                    value=format_bands(H2_BANDS),
+                    debounce=True,
+                    style={'width': '190px', 'fontSize': '16px', 'border': '1px solid', 'borderColor': ''}
+                )
+            ],
+            style={
+                'position': 'absolute',
+                'top': '85px',
+                'right': '55px',
+                'display': 'inline-flex',
+                'alignItems': 'center'
+            }
+        ),
+
         ### CHECKBOXES
         html.Div(
             [
@@ -55,9 +69,17 @@ def main_layout():
         html.Div(
             [
                 html.Label(
-                    "BP Integrated H2 Map:",
+                    "H2 Map:",
                     style={'fontFamily': 'Arial', 'fontSize': '20px', 'color': '#414141', 'margin-right': '10px'}
                 ),
+                dcc.Dropdown(
+                    id='bg-layer-dropdown',
+                    options=[{'label': layer['label'], 'value': name} for name, layer in BACKGROUND_LAYERS.items()],
+                    value='h2',
+                    clearable=False,
+                    searchable=False,
+                    style={'width': '170px', 'fontFamily': 'Arial', 'fontSize': '16px', 'margin-right': '10px'}
+                ),
                 dcc.Checklist(
                     id='show-bg-checkbox',
                     options=[{'label': '', 'value': True}],
@@ -116,6 +138,49 @@ def main_layout():
             }
         ),
 
+        ### REGION SPECTRUM (box select on the map, or a named cloud)
+        html.Div(
+            [
+                html.Label(
+                    "Region:",
+                    style={'fontFamily': 'Arial', 'fontSize': '16px', 'color': '#414141', 'margin-right': '10px'}
+                ),
+                dcc.Dropdown(
+                    id='region-dropdown',
+                    options=list(REGIONS),
+                    value=None,
+                    placeholder='Box select or pick',
+                    searchable=False,
+                    style={'width': '180px', 'fontFamily': 'Arial', 'fontSize': '14px', 'margin-right': '10px'}
+                ),
+                dcc.RadioItems(
+                    id='region-statistic',
+                    options=list(STATISTICS),
+                    value='mean',
+                    inline=True,
+                    labelStyle={'margin-right': '8px'},
+                    style={'fontFamily': 'Arial', 'fontSize': '14px', 'color': '#414141'}
+                ),
+                # Shown while the region spectrum is computed in the background
+                html.Span(
+                    id='region-progress',
+                    style={'fontFamily': 'Arial', 'fontSize': '12px', 'color': '#414141', 'margin-left': '4px'}
+                ),
+                html.Button(
+                    "Cancel",
+                    id='region-cancel-btn',
+                    style={'display': 'none'}
+                )
+            ],
+            style={
+                'position': 'absolute',
+                'top': '243px',
+                'right': '15px',
+                'display': 'inline-flex',
+                'alignItems': 'center'
+            }
+        ),
+
         ### H2 SPECTRA PLOT
         dcc.Graph(
             id='h2-spectra-plot-chan1',
@@ -285,9 +350,44 @@ def main_layout():
             }
         ),
         dcc.Download(id="download-csv"),
+
+        ### STARS NEAR CLICKED H2 PIXEL
+        html.Div(
+            [
+                html.Label("Stars within", style={'margin-right': '5px'}),
+                dcc.Input(
+                    id='nearby-radius',
+                    type='number',
+                    value=5,
+                    min=0.1,
+                    max=30,
+                    step=0.1,
+                    debounce=True,
+                    style={'width': '50px', 'fontSize': '16px'}
+                ),
+                html.Label("° of clicked pixel:", style={'margin': '0 10px 0 5px'}),
+                html.Div(
+                    id='nearby-stars',
+                    children="Click on a pixel to list nearby stars",
+                    style={'overflowX': 'auto', 'whiteSpace': 'nowrap', 'flex': '1'}
+                )
+            ],
+            style={
+                'position': 'absolute',
+                'bottom': '190px',
+                'right': '535px',
+                'width': '725px',
+                'height': '40px',
+                'display': 'flex',
+                'alignItems': 'center',
+                'fontFamily': 'Arial',
+                'fontSize': '16px',
+                'color': '#414141'
+            }
+        ),
     ]
-    if args.local:
-        children.extend([
+    if local:
+        children.append(
             html.Button(
                 "Spectral Fitting View",
                 id="switch-to-alt-btn",
@@ -301,42 +401,23 @@ def main_layout():
                     "fontSize": "18px",
                     "fontFamily": 'Arial',
                 }
-            ),
-            html.Button(id="switch-to-main-btn", style={"display": "none"})
-        ])
+            )
+        )
     else:
-        children.extend([
-            html.Button(id="switch-to-alt-btn", style={"display": "none"}),
-            html.Button(id="switch-to-main-btn", style={"display": "none"})
-        ])
+        children.append(html.Button(id="switch-to-alt-btn", style={"display": "none"}))
 
     return html.Div(
         id="main-container",
         children=children
     )
 
-def alt_layout():
+def alt_layout(local=False):
 
-    children=[
-        
-        ### HIDDEN COMPONENTS
-        html.Button(id="scatter-plot", style={"display": "none"}),
-        html.Div([dcc.Checklist(id='show-spectra-checkbox')]),
-        html.Div([dcc.Checklist(id='show-bg-checkbox')]),
-        html.Div([dcc.Checklist(id='norm-spectra-checkbox')]),
-        html.Div([dcc.Checklist(id='show-cont-checkbox')]),
-        html.Div([dcc.Graph(id='nighttime-frac-plot', style={"display": "none"})]),
-        html.Div(id="clicked-star", style={"display": "none"}),
-        html.Button(id="download-btn", style={"display": "none"}),
-        html.Div([dcc.Download(id='download-csv')]),
-        html.Div(id="selected-stars", style={"display": "none"}),
-
-        html.Div([dcc.Graph(id='h2-spectra-plot-chan1', style={"display": "none"})]),
-        html.Div([dcc.Graph(id='h2-spectra-plot-chan2', style={"display": "none"})]),
-        html.Div(id="h2-spectra-plot-text", style={"display": "none"})
-    ]
-    if args.local:
-        children.extend([
+    # Both views stay mounted and are shown/hidden in the browser, so the alt
+    # view only needs its own components
+    children=[]
+    if local:
+        children.append(
             html.Button(
                 "Exploratory View",
                 id="switch-to-main-btn",
@@ -349,37 +430,30 @@ def alt_layout():
                     "fontSize": "18px",
                     "fontFamily": 'Arial',
                 }
-            ),
-            html.Button(id="switch-to-alt-btn", style={"display": "none"})
-        ])
+            )
+        )
     else:
-        children.extend([
-            html.Button(id="switch-to-main-btn", style={"display": "none"}),
-            html.Button(id="switch-to-alt-btn", style={"display": "none"})
-        ])
-
+        children.append(html.Button(id="switch-to-main-btn", style={"display": "none"}))
 
     return html.Div(
         id="alt-container",
+        style={"display": "none"},
         children=children
     )
 
-def default_layout():
+def default_layout(local=False):
     return html.Div(
         id="default-container",
         children=[
 
-            dcc.Store(id="show-spectra-checkbox-store", data=[]),
-            dcc.Store(id="show-bg-checkbox-store", data=[]),
-            dcc.Store(id="norm-spectra-checkbox-store", data=[]),
-            dcc.Store(id="show-cont-checkbox-store", data=[]),
-            dcc.Store(id="scatter-store", data=None),
             dcc.Store(id="clicked-star-store", data=None),
             dcc.Store(id="selected-stars-store", data=None),
             dcc.Store(id="clicked-bg-store", data=None),
+            dcc.Store(id="region-store", data=None),
+            dcc.Store(id="view-range-store", data=None),
 
             dcc.Store(id="layout-store", data="main"),
             html.Div(id="dynamic-layout",
-                     children=main_layout())
+                     children=[main_layout(local), alt_layout(local)])
         ]
-    )
\ No newline at end of file
+    )
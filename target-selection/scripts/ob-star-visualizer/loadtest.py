@@ -0,0 +1,302 @@
+"""
+Load generator for a running visualizer (python main.py, or gunicorn -c gunicorn.conf.py wsgi:server).
+
+Each virtual user replays random interaction sequences the way the Dash renderer would: an interaction changes
+one or more component properties, and every server-side callback with one of them as an Input is POSTed to
+/_dash-update-component at once, with the current values of its inputs and state. Callback definitions come from
+/_dash-dependencies and initial property values (and the stars to click on) from /_dash-layout, so the harness
+follows the app as callbacks are added or changed. Store outputs in the responses are fed back into the user's
+state, so restore paths see realistic values.
+
+Interactions: clicking a star, clicking the H2 background, box-selecting, panning/zooming (the view-range store),
+toggling the background, IUE and layout checkboxes, and picking a named region. Interactions handled entirely by
+clientside callbacks (e.g. the layout switch buttons) send no requests and are only counted. Background callbacks
+are polled for their result as the renderer does it, and their latency is the time to the result.
+
+Reports throughput, latency percentiles and error rates, overall and per callback. Needs aiohttp.
+
+Examples:
+    python loadtest.py --users 20 --duration 60
+    python loadtest.py --url http://127.0.0.1:8000 --users 50 --think 0.5 --json before.json
+"""
+
+import argparse
+import asyncio
+import base64
+import collections
+import json
+import random
+import time
+import aiohttp
+import numpy as np
+
+UPDATE_PATH = '_dash-update-component'
+
+# Relative frequency of each interaction in a session
+INTERACTIONS = {
+    'click_star': 30,
+    'click_background': 20,
+    'pan_zoom': 15,
+    'box_select': 10,
+    'iue_options': 10,
+    'toggle_background': 5,
+    'pick_region': 5,
+    'switch_layout': 5,
+}
+
+
+def decode_array(value):
+    """Plotly typed-array dicts ({'dtype', 'bdata'}) -> list; anything else is returned unchanged."""
+    if isinstance(value, dict) and 'bdata' in value:
+        array = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+        return (array.reshape(value['shape']) if 'shape' in value else array).tolist()
+    return value
+
+
+def layout_props(node, props=None):
+    """id -> {property: value} for every component with an id in a serialized layout."""
+    props = {} if props is None else props
+    if isinstance(node, list):
+        for child in node:
+            layout_props(child, props)
+    elif isinstance(node, dict) and 'props' in node:
+        if 'id' in node['props']:
+            props[node['props']['id']] = node['props']
+        layout_props(node['props'].get('children'), props)
+    return props
+
+
+def parse_outputs(output):
+    """'..a.figure...b.children@hash..' -> [{'id': 'a', 'property': 'figure'}, ...], or one dict for a single output."""
+    multi = output.startswith('..')
+    items = output[2:-2].split('...') if multi else [output]
+    outputs = [dict(zip(('id', 'property'), item.rsplit('.', 1))) for item in items]
+    for out in outputs:
+        out['property'] = out['property'].split('@')[0]
+    return outputs if multi else outputs[0]
+
+
+class Callback:
+    """A server-side callback from /_dash-dependencies."""
+
+    def __init__(self, dependency):
+        self.output = dependency['output']
+        self.outputs = parse_outputs(self.output)
+        self.inputs = dependency['inputs']
+        self.state = dependency['state']
+        self.input_ids = {f"{i['id']}.{i['property']}" for i in self.inputs}
+        # Callbacks can share outputs (allow_duplicate), so the inputs are part of the name
+        first = self.outputs[0] if isinstance(self.outputs, list) else self.outputs
+        extra = len(self.outputs) - 1 if isinstance(self.outputs, list) else 0
+        self.name = (f"{first['id']}.{first['property']}" + (f" (+{extra})" if extra else "")
+                     + f" <- {', '.join(sorted(self.input_ids))}")
+        # Background callbacks answer with a job handle, then are polled every interval ms for the result
+        self.poll_interval = dependency['background']['interval'] / 1000 if dependency.get('background') else None
+
+    def body(self, values, changed):
+        def with_values(deps):
+            return [dict(dep, value=values.get(f"{dep['id']}.{dep['property']}")) for dep in deps]
+        return {'output': self.output, 'outputs': self.outputs, 'inputs': with_values(self.inputs),
+                'state': with_values(self.state), 'changedPropIds': sorted(changed & self.input_ids)}
+
+
+class App:
+    """What the harness knows about the app under test."""
+
+    def __init__(self, dependencies, layout):
+        self.callbacks = [Callback(dep) for dep in dependencies if not dep.get('clientside_function')]
+        props = layout_props(layout)
+        self.initial = {f"{cid}.{prop}": value for cid, component in props.items() if isinstance(cid, str)
+                        for prop, value in component.items() if prop != 'children'}
+
+        figure = props['scatter-plot']['figure']
+        self.stars = []
+        for trace in figure['data']:
+            if trace.get('meta') == 'all-stars':
+                for x, y, custom in zip(decode_array(trace['x']), decode_array(trace['y']), trace['customdata']):
+                    self.stars.append({'x': x, 'y': y, 'customdata': list(custom)})
+        self.regions = [option['value'] if isinstance(option, dict) else option
+                        for option in props.get('region-dropdown', {}).get('options', [])]
+
+    def triggered(self, changed):
+        return [callback for callback in self.callbacks if callback.input_ids & changed]
+
+
+def interaction(name, app, rng):
+    """Property changes of one interaction, as {'id.property': value}."""
+    if name == 'click_star':
+        star = rng.choice(app.stars)
+        return {'scatter-plot.clickData': {'points': [dict(star, curveNumber=1, pointNumber=0)]}}
+    if name == 'click_background':
+        return {'scatter-plot.clickData': {'points': [{'x': rng.uniform(0, 360), 'y': rng.uniform(-90, 90),
+                                                       'curveNumber': 0}]}}
+    if name == 'pan_zoom':
+        width, height = rng.choice([(360, 180), (120, 60), (40, 20), (10, 6)])
+        x0, y0 = rng.uniform(0, 360 - width), rng.uniform(-90, 90 - height)
+        return {'view-range-store.data': {'x': [x0, x0 + width], 'y': [y0, y0 + height]}}
+    if name == 'box_select':
+        x0, y0 = rng.uniform(0, 340), rng.uniform(-60, 40)
+        x1, y1 = x0 + rng.uniform(2, 20), y0 + rng.uniform(2, 20)
+        points = [star for star in app.stars if x0 <= star['x'] <= x1 and y0 <= star['y'] <= y1]
+        return {'scatter-plot.selectedData': {'points': points, 'range': {'x': [x0, x1], 'y': [y0, y1]}}}
+    if name == 'iue_options':
+        prop = rng.choice(['norm-spectra-checkbox.value', 'show-cont-checkbox.value'])
+        return {prop: rng.choice([[], [True]])}
+    if name == 'toggle_background':
+        return {'show-bg-checkbox.value': rng.choice([[], [True]]),
+                'bg-layer-dropdown.value': rng.choice(['h2', 'temperature', 'amplitude'])}
+    if name == 'pick_region':
+        return {'region-dropdown.value': rng.choice(app.regions)} if app.regions else {}
+    if name == 'switch_layout':
+        return {rng.choice(['switch-to-alt-btn.n_clicks', 'switch-to-main-btn.n_clicks']): 1}
+    raise ValueError(f"unknown interaction {name!r}")
+
+
+class Results:
+
+    def __init__(self):
+        self.latency = collections.defaultdict(list)    # callback -> ms
+        self.errors = collections.Counter()
+        self.error_kinds = collections.Counter()     # HTTP status or exception name -> count
+        self.interactions = collections.Counter()
+        self.bytes = 0
+
+    def summary(self, elapsed):
+        all_ms = np.concatenate([np.array(ms) for ms in self.latency.values()]) if self.latency else np.zeros(0)
+        requests = len(all_ms)
+
+        def stats(ms, errors):
+            ms = np.asarray(ms)
+            p50, p90, p99 = np.percentile(ms, [50, 90, 99]) if len(ms) else (np.nan,) * 3
+            return {'requests': int(len(ms)), 'errors': int(errors), 'error_rate': errors / max(len(ms), 1),
+                    'p50_ms': float(p50), 'p90_ms': float(p90), 'p99_ms': float(p99),
+                    'max_ms': float(ms.max()) if len(ms) else float('nan')}
+
+        return {
+            'elapsed_s': elapsed,
+            'requests': requests,
+            'throughput_rps': requests / elapsed if elapsed else 0.0,
+            'interactions': dict(self.interactions),
+            'interactions_per_s': sum(self.interactions.values()) / elapsed if elapsed else 0.0,
+            'response_mb': self.bytes / 1e6,
+            'overall': stats(all_ms, sum(self.errors.values())),
+            'error_kinds': dict(self.error_kinds),
+            'callbacks': {name: stats(ms, self.errors[name]) for name, ms in sorted(self.latency.items())},
+        }
+
+
+async def post(session, url, callback, body, results):
+    """One callback invocation; for background callbacks the latency runs until the result arrives."""
+    t0 = time.perf_counter()
+    params = None
+    try:
+        while True:
+            async with session.post(url, json=body, params=params) as response:
+                data = await response.read()
+                ok = response.status in (200, 204)   # 204: PreventUpdate, or a cancelled background job
+                kind = f"HTTP {response.status}"
+            results.bytes += len(data)
+            if not ok or not data or callback.poll_interval is None:
+                break
+            # A background callback first returns its job handle, then progress until the result is ready
+            reply = json.loads(data)
+            if 'response' in reply:
+                break
+            if 'cacheKey' in reply:
+                params = {'cacheKey': reply['cacheKey'], 'job': reply['job']}
+            elif params is None:
+                break
+            await asyncio.sleep(callback.poll_interval)
+    except aiohttp.ClientError as error:
+        data, ok, kind = b'', False, type(error).__name__
+    results.latency[callback.name].append((time.perf_counter() - t0) * 1000)
+    if not ok:
+        results.errors[callback.name] += 1
+        results.error_kinds[kind] += 1
+        return None
+    return data
+
+
+def apply_response(values, data):
+    """Feeds a callback response back into a user's property values (patches are skipped)."""
+    try:
+        response = json.loads(data).get('response', {})
+    except (ValueError, AttributeError):
+        return
+    for cid, props in response.items():
+        for prop, value in props.items():
+            if not (isinstance(value, dict) and '__dash_patch_update' in value):
+                values[f"{cid}.{prop}"] = value
+
+
+async def user(app, base_url, deadline, think, rng, results):
+    url = base_url.rstrip('/') + '/' + UPDATE_PATH
+    values = dict(app.initial)
+    names, weights = zip(*INTERACTIONS.items())
+    async with aiohttp.ClientSession() as session:
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            changed = interaction(name, app, rng)
+            values.update(changed)
+            results.interactions[name] += 1
+
+            # The renderer fires every callback the change triggers concurrently
+            callbacks = app.triggered(set(changed))
+            bodies = [callback.body(values, set(changed)) for callback in callbacks]
+            responses = await asyncio.gather(*(post(session, url, callback, body, results)
+                                               for callback, body in zip(callbacks, bodies)))
+            for data in responses:
+                if data:
+                    apply_response(values, data)
+            if think:
+                await asyncio.sleep(rng.expovariate(1 / think))
+
+
+async def run(base_url, users, duration, think, seed):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(base_url.rstrip('/') + '/_dash-dependencies') as response:
+            dependencies = await response.json(content_type=None)
+        async with session.get(base_url.rstrip('/') + '/_dash-layout') as response:
+            layout = await response.json(content_type=None)
+    app = App(dependencies, layout)
+
+    results = Results()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(user(app, base_url, t0 + duration, think, random.Random(seed + i), results)
+                           for i in range(users)))
+    return results.summary(time.perf_counter() - t0)
+
+
+def print_summary(summary, users):
+    overall = summary['overall']
+    print(f"{users} users, {summary['elapsed_s']:.1f} s: {summary['requests']} requests "
+          f"({summary['throughput_rps']:.1f}/s), {sum(summary['interactions'].values())} interactions "
+          f"({summary['interactions_per_s']:.1f}/s), {summary['response_mb']:.1f} MB received")
+    width = max(map(len, summary['callbacks']), default=8)
+    print(f"{'callback':<{width}s} {'requests':>8s} {'errors':>7s} {'p50 ms':>8s} {'p90 ms':>8s} {'p99 ms':>8s} {'max ms':>8s}")
+    for name, stats in list(summary['callbacks'].items()) + [('ALL', overall)]:
+        print(f"{name:<{width}s} {stats['requests']:8d} {stats['errors']:7d} {stats['p50_ms']:8.1f} {stats['p90_ms']:8.1f} "
+              f"{stats['p99_ms']:8.1f} {stats['max_ms']:8.1f}")
+    if summary['error_kinds']:
+        print("errors: " + ", ".join(f"{kind} x{count}" for kind, count in sorted(summary['error_kinds'].items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay interaction sequences against a running visualizer.")
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:8050', help='Base URL of the app')
+    parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30, help='Test length (s)')
+    parser.add_argument('--think', type=float, default=0.0, help='Mean pause between interactions (s); 0 = none')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the first user')
+    parser.add_argument('--json', type=str, default=None, help='Also write the summary to this JSON file')
+    args = parser.parse_args()
+
+    summary = asyncio.run(run(args.url, args.users, args.duration, args.think, args.seed))
+    print_summary(summary, args.users)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(dict(summary, users=args.users, url=args.url), f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
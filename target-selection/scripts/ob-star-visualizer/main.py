@@ -1,14 +1,50 @@
-from layout import app, default_layout, args
-from callbacks import register_callbacks
+from dash import Dash
+import argparse
 import os
 
-app.layout = default_layout()
-register_callbacks(app)
+from background import job_manager
+from data import DATA_VERSION
+from layout import default_layout
+from callbacks import register_callbacks
+from instrumentation import instrument
+
+# ==================================================
+# App Factory
+# ==================================================
+
+def create_app(local=False):
+    """
+    Builds the Dash app. The catalogue, maps and spectra it serves are loaded once, when data.py is first imported,
+    so every app (and, under gunicorn --preload, every forked worker) shares them. Every callback is timed and
+    measured (see instrumentation.py); the metrics are at /metrics. Long-running callbacks run as background jobs
+    (see background.py).
+
+    Parameters:
+    - local (bool): Enable the development-only spectral fitting view.
+
+    Returns:
+    - Dash: The app; its WSGI server is app.server.
+    """
+    app = Dash(__name__, background_callback_manager=job_manager(DATA_VERSION))
+    app.layout = default_layout(local)
+    register_callbacks(app)
+    instrument(app)
+    return app
 
 if __name__ == '__main__':
 
+    parser = argparse.ArgumentParser(description="Run the OB star visualizer with the development server.")
+    parser.add_argument(
+        '--local',
+        action='store_true',
+        default=False,
+        help='Enable local mode (default: False)'
+    )
+    args = parser.parse_args()
+
+    app = create_app(local=args.local)
     if args.local:
-        app.run_server(debug=True)
+        app.run(debug=True)
     else:
         port = int(os.environ.get("PORT", 8050))
-        app.run_server(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+        app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,101 @@
+"""
+Compact figure payloads for the visualizer's callbacks.
+
+Dash serializes numpy arrays in callback outputs as JSON lists, about 20 characters per float64. plotly.js also
+accepts typed arrays, {'dtype': 'f4', 'bdata': <base64 of the little-endian buffer>}, the form plotly.py itself
+writes in fig.to_dict(); in float32 that is 5.3 characters per value. Float32 keeps 7 significant digits, which is
+far below what a spectrum panel or heatmap can show, but must not be used for values that are read back and
+compared exactly (ids, pixel indices, customdata).
+
+Line traces also drop x when it is evenly spaced (x0/dx instead), and are decimated to the plotted width with
+min/max downsampling: every bin of consecutive samples keeps its lowest and highest point, in their original order,
+so narrow lines and spikes stay visible.
+"""
+
+import base64
+import numpy as np
+
+def typed_array(values, dtype='f4'):
+    """
+    Encodes an array as a plotly.js typed array.
+
+    Parameters:
+    - values (array_like): Values to encode; NaN stays NaN (a gap in plotly.js).
+    - dtype (str): numpy / plotly.js short type code ('f4', 'f8', 'i4', ...).
+
+    Returns:
+    - dict: {'dtype', 'bdata'}, plus 'shape' ("rows, cols") for 2-D arrays.
+    """
+    array = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    spec = {'dtype': dtype, 'bdata': base64.b64encode(array).decode('ascii')}
+    if array.ndim > 1:
+        spec['shape'] = ', '.join(map(str, array.shape))
+    return spec
+
+def minmax_decimate(x, y, n_bins):
+    """
+    Min/max downsampling of a line to at most 2 * n_bins points.
+
+    Parameters:
+    - x (ndarray): Sample positions, sorted.
+    - y (ndarray): Sample values; NaN is ignored when picking a bin's extremes.
+    - n_bins (int): Number of bins, i.e. the plotted width in pixels.
+
+    Returns:
+    - tuple: (x, y), unchanged if they already have at most 2 * n_bins points.
+    """
+    x, y = np.asarray(x), np.asarray(y, dtype=float)
+    if len(y) <= 2 * n_bins:
+        return x, y
+
+    # Equal-count bins, the last one padded with NaN
+    size = -(-len(y) // n_bins)
+    n_bins = -(-len(y) // size)
+    padded = np.full(n_bins * size, np.nan)
+    padded[:len(y)] = y
+    bins = padded.reshape(n_bins, size)
+    filled = ~np.isnan(bins).all(axis=1)
+
+    # All-NaN bins keep their first sample, so the gap is still drawn
+    bins = np.where(filled[:, None], bins, 0)
+    offsets = np.arange(n_bins) * size
+    low = np.nanargmin(bins, axis=1) + offsets
+    high = np.nanargmax(bins, axis=1) + offsets
+    keep = np.unique(np.concatenate((low, high)))
+    keep = keep[keep < len(y)]
+    return x[keep], y[keep]
+
+def line_trace(x, y, width=None, dtype='f4', **props):
+    """
+    A scatter trace dict with x and y as typed arrays, for spectra and other dense lines.
+
+    Parameters:
+    - x (array_like): Sample positions, sorted.
+    - y (array_like): Sample values.
+    - width (int): Plotted width in pixels; longer lines are min/max decimated to it (default: no decimation).
+    - dtype (str): Typed array type for x and y.
+    - props: Other trace properties (mode, line_color, ...); underscores nest as in go.Scatter.
+
+    Returns:
+    - dict: The trace.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if width is not None:
+        x, y = minmax_decimate(x, y, width)
+
+    trace = {'type': 'scatter'}
+    for key, value in props.items():
+        parent, _, child = key.partition('_')
+        if child and parent in ('line', 'marker'):
+            trace.setdefault(parent, {})[child] = value
+        else:
+            trace[key] = value
+
+    # Evenly spaced x (to a thousandth of a step) goes as x0/dx
+    dx = (x[-1] - x[0]) / (len(x) - 1) if len(x) > 2 else 0
+    if dx > 0 and np.max(np.abs(x - (x[0] + dx * np.arange(len(x))))) <= 1e-3 * dx:
+        trace.update(x0=float(x[0]), dx=float(dx))
+    else:
+        trace['x'] = typed_array(x, dtype)
+    trace['y'] = typed_array(y, dtype)
+    return trace
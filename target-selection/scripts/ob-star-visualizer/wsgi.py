@@ -0,0 +1,14 @@
+"""
+WSGI entry point for production serving:
+
+    gunicorn -c gunicorn.conf.py wsgi:server
+
+OB_VISUALIZER_LOCAL=1 enables the spectral fitting view, like main.py --local.
+"""
+
+import os
+
+from main import create_app
+
+app = create_app(local=os.environ.get("OB_VISUALIZER_LOCAL") == "1")
+server = app.server
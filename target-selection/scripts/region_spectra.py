@@ -0,0 +1,79 @@
+"""
+Description:
+Region-aggregated FIMS/SPEAR spectra. The galactic (l, b) centre of every HEALPix pixel is put in a SkyIndex once, so
+the pixels inside a box or cone are found without scanning the sky, and named regions (molecular clouds) are resolved
+to pixel lists up front. The mean, median and summed spectrum of a region is then one reduction over the rows of the
+(npix, n_wavs) map.
+"""
+
+import healpy as hp
+import numpy as np
+
+from sky_index import SkyIndex
+
+# Approximate galactic boxes (l_min, l_max, b_min, b_max) in degrees around well-known clouds
+REGIONS = {
+    'Taurus': (165, 180, -22, -8),
+    'Perseus': (154, 164, -25, -15),
+    'Orion A/B': (200, 216, -22, -12),
+    'Ophiuchus': (348, 358, 12, 25),
+    'Chamaeleon': (295, 305, -20, -12),
+    'Cygnus X': (72, 86, -4, 6),
+}
+
+STATISTICS = ('mean', 'median', 'sum')
+
+
+class RegionSpectra:
+    """
+    Pixel lookups and spectral reductions over a RING-ordered HEALPix spectral map.
+
+    Parameters:
+    - fims_map (np.ndarray): (npix, n_wavs) map in galactic coordinates.
+    - regions (dict): Name -> (l_min, l_max, b_min, b_max) box, resolved to pixels at construction.
+
+    Attributes:
+    - l, b (np.ndarray): Galactic coordinates of every pixel centre (deg).
+    - region_pixels (dict): Name -> pixel numbers inside the region.
+    """
+
+    def __init__(self, fims_map, regions=REGIONS):
+        self.fims_map = fims_map
+        nside = hp.npix2nside(len(fims_map))
+        self.l, self.b = hp.pix2ang(nside, np.arange(len(fims_map)), nest=False, lonlat=True)
+        self.index = SkyIndex(self.l, self.b)
+        self.region_pixels = {name: self.index.box(*box) for name, box in regions.items()}
+
+    def box_pixels(self, l_min, l_max, b_min, b_max):
+        """Pixels centred in the box; runs eastward from l_min to l_max and may cross l = 0."""
+        return self.index.box(l_min, l_max, b_min, b_max)
+
+    def cone_pixels(self, l, b, radius):
+        """Pixels centred within radius degrees of (l, b)."""
+        return self.index.cone(l, b, radius)[0]
+
+    def aggregate(self, pixels, statistics=STATISTICS):
+        """
+        Reduces the spectra of a set of pixels.
+
+        Parameters:
+        - pixels (np.ndarray): Pixel numbers, e.g. from box_pixels, cone_pixels or region_pixels.
+        - statistics (iterable): Any of 'mean', 'median' and 'sum'.
+
+        Returns:
+        - dict: Statistic -> spectrum (n_wavs,), plus 'n_pixels'. Spectra are None for an empty region.
+        """
+        spectra = self.fims_map[np.asarray(pixels, dtype=int)]
+        result = {'n_pixels': len(spectra)}
+        for statistic in statistics:
+            if len(spectra) == 0:
+                result[statistic] = None
+            elif statistic == 'mean':
+                result[statistic] = spectra.mean(axis=0)
+            elif statistic == 'median':
+                result[statistic] = np.median(spectra, axis=0)
+            elif statistic == 'sum':
+                result[statistic] = spectra.sum(axis=0)
+            else:
+                raise ValueError(f"unknown statistic {statistic!r}; expected one of {STATISTICS}")
+        return result
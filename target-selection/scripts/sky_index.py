@@ -0,0 +1,87 @@
+"""
+Description:
+Spherical spatial index over galactic (l, b) positions. Stars are stored as unit vectors in a KD-tree, so cone
+and k-nearest queries are exact great-circle searches with no special cases at l = 0/360 or near the poles;
+box queries use a latitude-sorted copy and a wrapped longitude test.
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+def lb_to_unit(l, b):
+    """Galactic longitude/latitude in degrees to unit vectors, shape (..., 3)."""
+    l, b = np.radians(l), np.radians(b)
+    return np.stack((np.cos(b) * np.cos(l), np.cos(b) * np.sin(l), np.sin(b)), axis=-1)
+
+
+def chord_to_angle(chord):
+    return np.degrees(2 * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1)))
+
+
+def angle_to_chord(angle):
+    return 2 * np.sin(np.radians(np.clip(angle, 0, 180)) / 2)
+
+
+class SkyIndex:
+    """
+    Cone, box and k-nearest lookups over a fixed set of sky positions.
+
+    Parameters:
+    - l (array-like): Galactic longitudes in degrees.
+    - b (array-like): Galactic latitudes in degrees.
+
+    All queries return row numbers into the arrays the index was built from.
+    """
+
+    def __init__(self, l, b):
+        self.l = np.mod(np.asarray(l, dtype=float), 360)
+        self.b = np.asarray(b, dtype=float)
+        self.tree = cKDTree(lb_to_unit(self.l, self.b))
+        self._b_order = np.argsort(self.b)
+        self._b_sorted = self.b[self._b_order]
+
+    def __len__(self):
+        return len(self.b)
+
+    def cone(self, l, b, radius):
+        """
+        Stars within radius degrees of (l, b).
+
+        Returns:
+        - tuple: (rows, separations in degrees), nearest first.
+        """
+        centre = lb_to_unit(l, b)
+        rows = np.array(self.tree.query_ball_point(centre, angle_to_chord(radius)), dtype=int)
+        separations = chord_to_angle(np.linalg.norm(self.tree.data[rows] - centre, axis=1))
+        order = np.argsort(separations)
+        return rows[order], separations[order]
+
+    def nearest(self, l, b, k=1):
+        """
+        The k stars closest to (l, b).
+
+        Returns:
+        - tuple: (rows, separations in degrees), nearest first.
+        """
+        k = min(k, len(self))
+        chords, rows = self.tree.query(lb_to_unit(l, b), k=k)
+        return np.atleast_1d(rows), chord_to_angle(np.atleast_1d(chords))
+
+    def box(self, l_min, l_max, b_min, b_max):
+        """
+        Stars with b_min <= b <= b_max and l between l_min and l_max.
+
+        Longitudes are taken modulo 360 and the box runs eastward from l_min to l_max, so
+        box(350, 10, ...) covers the 20 degrees across l = 0. A span of 360 or more covers all longitudes.
+
+        Returns:
+        - np.ndarray: Rows, sorted.
+        """
+        start = np.searchsorted(self._b_sorted, b_min, side='left')
+        stop = np.searchsorted(self._b_sorted, b_max, side='right')
+        rows = self._b_order[start:stop]
+        if l_max - l_min < 360:
+            width = np.mod(l_max - l_min, 360)
+            rows = rows[np.mod(self.l[rows] - l_min, 360) <= width]
+        return np.sort(rows)